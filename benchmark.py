@@ -0,0 +1,610 @@
+#
+# RTEMS Project (https://www.rtems.org/)
+#
+# Copyright (c) 2026 RTEMS Project Contributors. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions
+#  are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+#
+# Micro-benchmarks for the RTEMS waf support.
+#
+# Run from the directory containing rtems_waf:
+#
+#  $ python -m rtems_waf.benchmark pkgconfig
+#
+# The gccdeps, bin2c and compress benchmarks need waflib, add the directory
+# waflib is in to PYTHONPATH.
+#
+# The benchmarks generate their inputs in a temporary directory and report
+# the operations per second. The gccdeps suite also reports the peak memory
+# allocated by Python if tracemalloc is available.
+#
+
+from __future__ import print_function
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+_pc_template = '''#
+# RTEMS BSP %(arch)s/%(bsp)s
+#
+prefix=/opt/rtems/6
+exec_prefix=${prefix}
+includedir=${prefix}/%(arch)s-rtems6/%(bsp)s/lib/include
+libdir=${exec_prefix}/%(arch)s-rtems6/%(bsp)s/lib
+ABI_FLAGS=-mcpu=cypress -mhard-float
+RTEMS_FLAGS=${ABI_FLAGS} -ffunction-sections -fdata-sections
+
+Name: %(arch)s-rtems6-%(bsp)s
+Version: 6.0.0
+Description: RTEMS BSP %(arch)s/%(bsp)s
+Requires: rtems-common
+CFLAGS: ${RTEMS_FLAGS} -isystem ${includedir} -qrtems -B${libdir}
+LDFLAGS: ${RTEMS_FLAGS} -L${libdir} -qrtems -Wl,--gc-sections
+Libs: ${RTEMS_FLAGS} -L${libdir} -lrtemscpu -lrtemsbsp
+Libs.private: -lm
+'''
+
+_pc_common = '''prefix=/opt/rtems/6
+Name: rtems-common
+Version: 6.0.0
+Description: RTEMS common
+CFLAGS: -DHAVE_RTEMS_COMMON
+Libs: -L${prefix}/lib -lrtemsdefaultconfig
+'''
+
+
+def _timeit(label, count, func, memory=None):
+    '''Time the function. If a memory setup function is provided the function
+    is run again with tracemalloc to measure the peak memory.'''
+    start = time.time()
+    func()
+    secs = time.time() - start
+    if secs <= 0:
+        secs = 1e-9
+    peak = ''
+    if memory is not None:
+        try:
+            import tracemalloc
+        except ImportError:
+            tracemalloc = None
+        if tracemalloc is not None:
+            memory()
+            tracemalloc.start()
+            try:
+                func()
+                peak = ' %8.1f MB peak' % \
+                    (tracemalloc.get_traced_memory()[1] / (1024.0 * 1024.0))
+            finally:
+                tracemalloc.stop()
+    print('%-40s %10.0f ops/sec %8.3f secs%s' %
+          (label, count / secs, secs, peak))
+    return secs
+
+
+class _legacy_package(object):
+    '''The pkgconfig package loader and expansion used before the cached
+    loader.'''
+    def __init__(self, file):
+        self.defines = {}
+        self.fields = {}
+        f = open(file)
+        for l in f.readlines():
+            l = l[:-1]
+            hash = l.find('#')
+            if hash >= 0:
+                l = l[:hash]
+            if len(l):
+                d = 0
+                define = False
+                eq = l.find('=')
+                dd = l.find(':')
+                if eq > 0 and dd > 0:
+                    if eq < dd:
+                        define = True
+                        d = eq
+                    else:
+                        define = False
+                        d = dd
+                elif eq >= 0:
+                    define = True
+                    d = eq
+                elif dd >= 0:
+                    define = False
+                    d = dd
+                if d > 0:
+                    lhs = l[:d].lower()
+                    rhs = l[d + 1:]
+                    if define:
+                        self.defines[lhs] = rhs
+                    else:
+                        self.fields[lhs] = rhs
+
+    def get(self, label):
+        mre = re.compile(r'\$\{[^\}]+\}')
+        s = self.fields[label.lower()]
+        expanded = True
+        while expanded:
+            expanded = False
+            ms = mre.findall(s)
+            for m in ms:
+                mn = m[2:-1]
+                if mn.lower() in self.defines:
+                    s = s.replace(m, self.defines[mn.lower()])
+                    expanded = True
+        return s
+
+
+def bench_pkgconfig(args):
+    from . import pkgconfig
+    count = 300
+    repeats = 20
+    if len(args) > 0:
+        count = int(args[0])
+    labels = ['CFLAGS', 'LDFLAGS', 'Libs']
+    tmp = tempfile.mkdtemp(prefix='rtems-waf-bench-')
+    try:
+        with open(os.path.join(tmp, 'rtems-common.pc'), 'w') as f:
+            f.write(_pc_common)
+        pcs = []
+        for n in range(count):
+            pc = os.path.join(tmp, 'sparc-rtems6-bsp%d.pc' % (n))
+            with open(pc, 'w') as f:
+                f.write(_pc_template % {'arch': 'sparc', 'bsp': 'bsp%d' % (n)})
+            pcs += [pc]
+
+        def legacy():
+            for pc in pcs:
+                pkg = _legacy_package(pc)
+                for label in labels:
+                    pkg.get(label)
+
+        def legacy_repeated():
+            for r in range(repeats):
+                legacy()
+
+        def cold():
+            for pc in pcs:
+                pkgconfig._cache.clear()
+                pkg = pkgconfig.package(pc)
+                for label in labels:
+                    pkg.get(label)
+
+        def warm():
+            for r in range(repeats):
+                for pc in pcs:
+                    pkg = pkgconfig.package(pc)
+                    for label in labels:
+                        pkg.get(label)
+
+        def resolve():
+            for pc in pcs:
+                pkg = pkgconfig.package(pc)
+                pkg.resolve('Libs', private=True)
+
+        print('pkgconfig: %d .pc files, %d labels' % (count, len(labels)))
+        _timeit('legacy load and get', count, legacy)
+        _timeit('load and get (uncached)', count, cold)
+        _timeit('legacy load and get (repeated)', count * repeats,
+                legacy_repeated)
+        _timeit('load and get (cached)', count * repeats, warm)
+        _timeit('resolve Libs with Requires', count, resolve)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _gccdeps_tree(tmp, headers, objects, deps, layout='absolute'):
+    '''Create a source tree of headers and a build tree of objects with .d
+    files. Each object depends on a window of the headers. The layout is how
+    the .d files refer to the headers:
+
+     absolute: Absolute paths.
+     relative: Paths relative to the build directory with `..` components.
+     spaces:   Absolute paths with escaped spaces in the directory names.
+     mixed:    All of the above.
+    '''
+    from waflib import Build
+    src = os.path.join(tmp, 'src')
+    out = os.path.join(tmp, 'build')
+    hdrs = []
+    for h in range(headers):
+        hdir = 'dir%d' % (h % 32)
+        if layout in ['spaces', 'mixed'] and h % 4 == 0:
+            hdir = 'dir with spaces %d' % (h % 32)
+        path = os.path.join(src, 'include', hdir, 'header%d.h' % (h))
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('/* header %d */\n' % (h))
+        hdrs += [path]
+    os.makedirs(out)
+    bld = Build.BuildContext(top_dir=src, out_dir=out)
+    bld.init_dirs()
+    bld.cur_tasks = []
+
+    def dep_path(n, hdr):
+        if layout == 'relative' or (layout == 'mixed' and n % 3 == 1):
+            rel = os.path.relpath(hdr, out).split(os.sep)
+            hdr = os.path.join(*(rel[:2] + ['..', rel[1]] + rel[2:]))
+        return hdr.replace(' ', '\\ ')
+
+    outputs = []
+    for o in range(objects):
+        c = os.path.join(src, 'file%d.c' % (o))
+        obj = os.path.join(out, 'file%d.o' % (o))
+        with open(c, 'w') as f:
+            f.write('')
+        with open(obj, 'w') as f:
+            f.write('')
+        with open(obj[:-2] + '.d', 'w') as f:
+            f.write('%s: %s \\\n' % (obj, c))
+            for d in range(deps):
+                f.write(' %s \\\n' %
+                        (dep_path(d, hdrs[(o * 7 + d) % headers])))
+            f.write('\n')
+        outputs += [(c, obj)]
+    return bld, hdrs, outputs
+
+
+def _gccdeps_tasks(bld, outputs):
+    from waflib import ConfigSet, Task, Utils
+    from . import gccdeps
+
+    class generator(object):
+        def __init__(self, bld):
+            self.bld = bld
+            self.path = bld.srcnode
+
+    cls = Task.classes.get('gccdeps_bench')
+    if cls is None:
+        cls = type('gccdeps_bench', (Task.Task, ), {})
+        cls.derived_gccdeps = cls
+        cls.post_run = gccdeps.post_run
+        cls.scan = gccdeps.scan
+        cls.sig_implicit_deps = gccdeps.sig_implicit_deps
+        cls.compute_sig_implicit_deps = gccdeps.compute_sig_implicit_deps
+        cls.signature = lambda self: Utils.SIG_NIL
+    env = ConfigSet.ConfigSet()
+    env.ENABLE_GCCDEPS = ['gccdeps_bench']
+    gen = generator(bld)
+    tasks = []
+    for c, obj in outputs:
+        tsk = cls(env=env, generator=gen)
+        tsk.set_inputs(bld.root.find_node(c))
+        tsk.set_outputs(bld.root.find_node(obj))
+        tasks += [tsk]
+    return tasks
+
+
+def _threaded(jobs, items, func):
+    '''Call the function for each item in the number of threads.'''
+    work = list(items)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if len(work) == 0:
+                    return
+                item = work.pop()
+            func(item)
+
+    threads = [threading.Thread(target=worker) for j in range(jobs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def bench_gccdeps_nodes(args):
+    from . import gccdeps
+    jobs = [1, 4, 16, 64]
+    if len(args) > 0:
+        jobs = [int(j) for j in args[0].split(',')]
+    headers = 2000
+    objects = 400
+    deps = 300
+    tmp = tempfile.mkdtemp(prefix='rtems-waf-bench-')
+    try:
+        bld, hdrs, outputs = _gccdeps_tree(tmp, headers, objects, deps)
+        print('gccdeps: %d objects, %d headers, %d deps per object' %
+              (objects, headers, deps))
+        for j in jobs:
+            bld.cached_nodes = {}
+
+            def lookup(o):
+                for d in range(deps):
+                    gccdeps.path_to_node(bld.root, hdrs[(o * 7 + d) % headers],
+                                         bld.cached_nodes)
+
+            _timeit('path_to_node (%d threads)' % (j), objects * deps,
+                    lambda: _threaded(j, range(objects), lookup))
+        for j in jobs:
+            bld.cached_nodes = {}
+            bld.node_deps = {}
+            tasks = _gccdeps_tasks(bld, outputs)
+            _timeit('post_run (%d threads)' % (j), objects,
+                    lambda: _threaded(j, tasks, lambda t: t.post_run()))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_gccdeps(args):
+    '''The gccdeps suite. The .d files are parsed, the paths resolved to
+    nodes, the tasks' post_run called and the implicit dependency signatures
+    created for different tree shapes and numbers of threads.'''
+    from waflib import Utils
+    from . import gccdeps
+    jobs = [1, 8, 32]
+    if len(args) > 0:
+        jobs = [int(j) for j in args[0].split(',')]
+    shapes = [(500, 200, 50, 'absolute'), (2000, 200, 300, 'absolute'),
+              (2000, 200, 300, 'relative'), (2000, 200, 300, 'spaces'),
+              (5000, 100, 1000, 'mixed')]
+    for headers, objects, deps, layout in shapes:
+        tmp = tempfile.mkdtemp(prefix='rtems-waf-bench-')
+        try:
+            bld, hdrs, outputs = _gccdeps_tree(tmp, headers, objects, deps,
+                                               layout)
+            print('gccdeps: %d objects, %d headers, %d deps per object, %s' %
+                  (objects, headers, deps, layout))
+
+            def parse():
+                for c, obj in outputs:
+                    for x in gccdeps.read_deps(obj[:-2] + '.d'):
+                        pass
+
+            _timeit(' parse .d (paths)', objects * deps, parse, lambda: None)
+            for j in jobs:
+
+                def reset():
+                    bld.cached_nodes = {}
+                    bld.node_deps = {}
+                    bld.imp_sigs = {}
+                    bld.cache_sig = {}
+                    try:
+                        del bld.gccdeps_interned
+                    except AttributeError:
+                        pass
+
+                reset()
+                tasks = _gccdeps_tasks(bld, outputs)
+                nodes = [(bld.root, hdr) for hdr in hdrs]
+
+                def lookup():
+                    _threaded(
+                        j, nodes, lambda n: gccdeps.path_to_node(
+                            n[0], n[1], bld.cached_nodes))
+
+                def post_run():
+                    _threaded(j, tasks, lambda t: t.post_run())
+
+                def implicit_sig(t):
+                    t.m = Utils.md5()
+                    t.sig_implicit_deps()
+
+                def sig_implicit_deps():
+                    bld.imp_sigs = {}
+                    bld.cache_sig = {}
+                    _threaded(j, tasks, implicit_sig)
+
+                _timeit(' path_to_node (%d threads)' % (j), len(nodes),
+                        lookup, reset)
+                reset()
+                _timeit(' post_run (%d threads)' % (j), objects, post_run,
+                        reset)
+                _timeit(' sig_implicit_deps (%d threads)' % (j), objects,
+                        sig_implicit_deps, lambda: None)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _legacy_dep_paths(txt):
+    '''The .d file parser gccdeps used before the streaming parser.'''
+    from . import gccdeps
+    txt = '\n'.join([
+        gccdeps.remove_makefile_rule_lhs(line) for line in txt.splitlines()
+    ])
+    txt = txt.replace('\\\n', '')
+    val = txt.strip()
+    return [x.replace('\\ ', ' ') for x in gccdeps.re_splitter.split(val) if x]
+
+
+def _dep_file(path, obj, deps, one_rule=True):
+    with open(path, 'w') as f:
+        if one_rule:
+            f.write('%s: %s.c \\\n' % (obj, obj[:-2]))
+        for d in range(deps):
+            hdr = '/opt/rtems/6/sparc-rtems6/erc32/lib/include/' \
+                  'rtems/score/header%d.h' % (d)
+            if d % 100 == 0:
+                hdr = 'path\\ with\\ spaces/header%d.h' % (d)
+            if one_rule:
+                f.write(' %s \\\n' % (hdr))
+            else:
+                f.write('%s: %s\n' % (obj, hdr))
+        f.write('\n')
+
+
+def bench_gccdeps_parse(args):
+    import io
+    from . import gccdeps
+    deps = 5000
+    repeats = 50
+    if len(args) > 0:
+        deps = int(args[0])
+    tmp = tempfile.mkdtemp(prefix='rtems-waf-bench-')
+    try:
+        print('gccdeps: .d files with %d paths' % (deps))
+        for one_rule in [True, False]:
+            rule = 'one rule'
+            if not one_rule:
+                rule = 'many rules'
+            path = os.path.join(tmp, 'file.d')
+            _dep_file(path, os.path.join(tmp, 'file.o'), deps, one_rule)
+
+            def legacy():
+                for r in range(repeats):
+                    with io.open(path, 'r', encoding='latin-1') as f:
+                        _legacy_dep_paths(f.read())
+
+            def streaming():
+                for r in range(repeats):
+                    for x in gccdeps.read_deps(path):
+                        pass
+
+            _timeit('legacy parser, %s (paths)' % (rule), deps * repeats,
+                    legacy)
+            _timeit('streaming parser, %s (paths)' % (rule), deps * repeats,
+                    streaming)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _run(cmd):
+    try:
+        subprocess.check_call(cmd)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return True
+
+
+def bench_bin2c(args):
+    '''Convert images of 1 MB to 256 MB to C and assembler files. The sizes
+    in MB can be given. The option `--cc=CC` compiles the files with the host
+    compiler and `--rtems-bin2c=PATH` times the RTEMS Tools Project's bin2c
+    command.'''
+    from . import rootfs
+    sizes = [1, 16, 64, 256]
+    cc = None
+    bin2c = None
+    if len([a for a in args if not a.startswith('--')]) > 0:
+        sizes = []
+    for a in args:
+        if a.startswith('--cc='):
+            cc = a[len('--cc='):]
+        elif a.startswith('--rtems-bin2c='):
+            bin2c = a[len('--rtems-bin2c='):]
+        else:
+            sizes += [int(a)]
+    tmp = tempfile.mkdtemp(prefix='rtems-waf-bench-')
+    try:
+        for size in sizes:
+            image = os.path.join(tmp, 'image.bin')
+            with open(image, 'wb') as f:
+                for mb in range(size):
+                    f.write(os.urandom(1024 * 1024))
+            c = os.path.join(tmp, 'image-bin.c')
+            asm = os.path.join(tmp, 'image-bin.S')
+            obj = os.path.join(tmp, 'image-bin.o')
+            print('bin2c: %d MB image' % (size))
+            _timeit('bin2c to C (MB)', size,
+                    lambda: rootfs.bin2c_write(c, image))
+            _timeit('bin2c to .incbin (MB)', size,
+                    lambda: rootfs.incbin_write(asm, image))
+            if bin2c is not None:
+                _timeit('rtems-bin2c to C (MB)', size,
+                        lambda: _run([bin2c, '-C', image, c]))
+            if cc is not None:
+                _timeit('compile C (MB)', size,
+                        lambda: _run([cc, '-c', c, '-o', obj]))
+                _timeit('assemble .incbin (MB)', size,
+                        lambda: _run([cc, '-c', asm, '-o', obj]))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_compress(args):
+    '''Compress an image with gzip using 1 to the number of CPUs threads
+    and with xz. The image is text and random data. The size in MB and the
+    level can be given.'''
+    import multiprocessing
+    from . import rootfs
+    size = 64
+    level = None
+    if len(args) > 0:
+        size = int(args[0])
+    if len(args) > 1:
+        level = int(args[1])
+    cpus = multiprocessing.cpu_count()
+    tmp = tempfile.mkdtemp(prefix='rtems-waf-bench-')
+    try:
+        with open(os.path.join(os.path.dirname(__file__), 'rtems.py'),
+                  'rb') as f:
+            text = f.read()
+        image = os.path.join(tmp, 'image.tar')
+        with open(image, 'wb') as f:
+            for mb in range(size):
+                if mb % 4 == 3:
+                    f.write(os.urandom(1024 * 1024))
+                else:
+                    f.write((text * (1024 * 1024 // len(text) + 1))[:1024 *
+                                                                   1024])
+        print('compress: %d MB image, %d CPUs' % (size, cpus))
+        jobs = 1
+        while True:
+            out = image + '.gz'
+            _timeit('gzip, %d thread(s) (MB)' % (jobs), size,
+                    lambda: rootfs.compress_write(out, image, 'gzip', level,
+                                                  jobs))
+            print('%-40s %10d bytes' % ('gzip size', os.stat(out).st_size))
+            if jobs >= cpus:
+                break
+            jobs = min(jobs * 2, cpus)
+        if rootfs.lzma is not None:
+            out = image + '.xz'
+            _timeit('xz (MB)', size,
+                    lambda: rootfs.compress_write(out, image, 'xz', level))
+            print('%-40s %10d bytes' % ('xz size', os.stat(out).st_size))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+benchmarks = {
+    'bin2c': bench_bin2c,
+    'compress': bench_compress,
+    'pkgconfig': bench_pkgconfig,
+    'gccdeps': bench_gccdeps,
+    'gccdeps-nodes': bench_gccdeps_nodes,
+    'gccdeps-parse': bench_gccdeps_parse
+}
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in benchmarks:
+        print('usage: %s benchmark [args]' % (os.path.basename(argv[0])),
+              file=sys.stderr)
+        print('benchmarks: %s' % (', '.join(sorted(benchmarks))),
+              file=sys.stderr)
+        return 1
+    benchmarks[argv[1]](argv[2:])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,140 @@
+#
+# RTEMS Project (https://www.rtems.org/)
+#
+# Copyright (c) 2026 RTEMS Project Contributors. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions
+#  are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+#
+# A persistent cache of configure results.
+#
+# The cache is held in the build directory's cache directory and survives a
+# reconfigure. Entries are held in sections and each entry has a key and a
+# fingerprint. An entry is only returned if the fingerprint matches so a
+# change to anything the result depends on makes the entry stale.
+#
+
+import hashlib
+import os
+
+from waflib import ConfigSet
+
+cache_file = 'rtems_configure.cache'
+cache_version = 1
+
+
+def fingerprint(*items):
+    '''Return a fingerprint of the items. The items need a stable repr.'''
+    return hashlib.sha1(repr(items).encode('utf-8')).hexdigest()
+
+
+def file_stamp(path):
+    '''Return a stamp of a file's path, modified time and size.'''
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, st.st_mtime, st.st_size)
+
+
+def file_contents(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+class cache(object):
+    '''A cache of configure results.'''
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.sections = {}
+        self.hits = {}
+        self.misses = {}
+        self.dirty = False
+        if enabled:
+            self.load()
+
+    def load(self):
+        env = ConfigSet.ConfigSet()
+        try:
+            env.load(self.path)
+        except (IOError, OSError):
+            return
+        except Exception:
+            #
+            # A corrupt cache is not an error, it is rebuilt.
+            #
+            return
+        if env.CACHE_VERSION != cache_version:
+            return
+        for section in env.keys():
+            if section != 'CACHE_VERSION' and isinstance(env[section], dict):
+                self.sections[section] = env[section]
+
+    def store(self):
+        if not self.enabled or not self.dirty:
+            return
+        env = ConfigSet.ConfigSet()
+        env.CACHE_VERSION = cache_version
+        for section in self.sections:
+            env[section] = self.sections[section]
+        env.store(self.path)
+        self.dirty = False
+
+    def get(self, section, key, fp):
+        '''Return the value if the fingerprint matches else None.'''
+        value = None
+        if self.enabled:
+            entry = self.sections.get(section, {}).get(key)
+            if entry is not None and entry[0] == fp:
+                value = entry[1]
+        if value is None:
+            self.misses[section] = self.misses.get(section, 0) + 1
+        else:
+            self.hits[section] = self.hits.get(section, 0) + 1
+        return value
+
+    def set(self, section, key, fp, value):
+        if self.enabled:
+            self.sections.setdefault(section, {})[key] = (fp, value)
+            self.dirty = True
+
+    def invalidate(self, key=None):
+        '''Remove the key from all sections. No key clears the cache.'''
+        if key is None:
+            if len(self.sections) != 0:
+                self.sections = {}
+                self.dirty = True
+        else:
+            for section in self.sections:
+                if key in self.sections[section]:
+                    del self.sections[section][key]
+                    self.dirty = True
+
+    def report(self, ctx, section):
+        if self.enabled:
+            ctx.msg(
+                'Configure cache (%s)' % (section), '%d hit(s), %d miss(es)' %
+                (self.hits.get(section, 0), self.misses.get(section, 0)))
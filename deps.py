@@ -0,0 +1,171 @@
+#
+# RTEMS Project (https://www.rtems.org/)
+#
+# Copyright (c) 2026 RTEMS Project Contributors. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions
+#  are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+#
+# Header rebuild impact report.
+#
+# The dependencies gccdeps collects for each object are held in the build
+# state with the object's compile time. The `deps` command loads a BSP's build
+# state and reports the headers that cause the most recompilation, the
+# objects with the largest include closures and the cost of touching a
+# header. A header's rebuild impact is the time to compile the objects that
+# include it.
+#
+
+import binascii
+import os
+
+from waflib import Build, Logs, Options
+
+#
+# The compile times are saved with the build state.
+#
+if 'gccdeps_stats' not in Build.SAVED_ATTRS:
+    Build.SAVED_ATTRS.append('gccdeps_stats')
+
+
+def options(opt):
+    opt.add_option_group('dependency report options')
+    dopts = opt.get_option_group('dependency report options')
+    dopts.add_option('--rtems-deps-top',
+                     default='20',
+                     dest='rtems_deps_top',
+                     help='Number of headers and objects reported by deps.')
+    dopts.add_option(
+        '--rtems-deps-header',
+        default=None,
+        dest='rtems_deps_header',
+        help='List of headers to report the cost of touching in deps.')
+
+
+class report(object):
+    '''The rebuild impact of the headers in a build state.'''
+    def __init__(self, bld):
+        self.bld = bld
+        self.objects = {}
+        self.headers = {}
+        self.timed = False
+        stats = getattr(bld, 'gccdeps_stats', {})
+        for uid, deps in bld.node_deps.items():
+            if uid in stats:
+                name, secs = stats[uid]
+                name = self._path(name)
+                self.timed = True
+            else:
+                name = 'task %s' % (binascii.hexlify(uid).decode('ascii'))
+                secs = 0.0
+            self.objects[uid] = (name, secs, len(deps))
+            for node in deps:
+                self.headers.setdefault(node, []).append(uid)
+
+    def _path(self, path):
+        for node in [self.bld.srcnode, self.bld.bldnode]:
+            base = node.abspath()
+            if path.startswith(base + os.sep):
+                return os.path.relpath(path, base)
+        return path
+
+    def header_name(self, node):
+        return self._path(node.abspath())
+
+    def cost(self, node):
+        '''Return the number of objects and compile time touching the header
+        rebuilds.'''
+        uids = self.headers.get(node, [])
+        return len(uids), sum([self.objects[uid][1] for uid in uids])
+
+    def impacts(self):
+        '''Return the headers sorted by rebuild impact. If no compile times
+        are known the impact is the number of objects.'''
+        impacts = []
+        for node in self.headers:
+            count, secs = self.cost(node)
+            impacts += [(secs, count, self.header_name(node))]
+        if self.timed:
+            return sorted(impacts, key=lambda i: (-i[0], -i[1], i[2]))
+        return sorted(impacts, key=lambda i: (-i[1], i[2]))
+
+    def closures(self):
+        '''Return the objects sorted by the size of their include closure.'''
+        return sorted([(deps, name) for name, secs, deps in
+                       self.objects.values()],
+                      key=lambda o: (-o[0], o[1]))
+
+    def find(self, header):
+        '''Find the headers matching a path. The path can be a header's full
+        path or its trailing path, for example rtems/score/cpuopts.h.'''
+        header = os.path.normpath(header)
+        return [
+            node for node in self.headers
+            if node.abspath() == header or
+            node.abspath().endswith(os.sep + header)
+        ]
+
+
+def show(bld, top=20, headers=None):
+    r = report(bld)
+    Logs.info('Dependency report: %s: %d objects, %d headers' %
+              (bld.variant, len(r.objects), len(r.headers)))
+    if len(r.objects) == 0:
+        Logs.warn('No dependencies found, build the BSP first')
+        return
+    if not r.timed:
+        Logs.warn('No compile times found, the impact is the object count')
+    Logs.info('Headers by rebuild impact (objects x compile time):')
+    for secs, count, name in r.impacts()[:top]:
+        Logs.info(' %10.3f secs %6d objects  %s' % (secs, count, name))
+    Logs.info('Objects by include closure:')
+    for deps, name in r.closures()[:top]:
+        Logs.info(' %6d headers  %s' % (deps, name))
+    if headers:
+        Logs.info('Cost of touching a header:')
+        for header in headers:
+            nodes = r.find(header)
+            if len(nodes) == 0:
+                Logs.info(' %s: not a dependency' % (header))
+            for node in nodes:
+                count, secs = r.cost(node)
+                Logs.info(' %s: %d objects, %.3f secs' %
+                          (r.header_name(node), count, secs))
+
+
+class deps_context(Build.BuildContext):
+    '''reports the header rebuild impact of a BSP's build'''
+    cmd = 'deps'
+
+    def execute(self):
+        self.restore()
+        if not self.all_envs:
+            self.load_envs()
+        top = 20
+        headers = None
+        try:
+            top = int(Options.options.rtems_deps_top)
+        except (AttributeError, TypeError, ValueError):
+            pass
+        if getattr(Options.options, 'rtems_deps_header', None):
+            headers = Options.options.rtems_deps_header.split(',')
+        show(self, top, headers)
@@ -0,0 +1,218 @@
+#
+# RTEMS Project (https://www.rtems.org/)
+#
+# Copyright (c) 2026 RTEMS Project Contributors. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions
+#  are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+#
+# Rebuild cause explanation.
+#
+# The signature of a task is made from the task's command, its inputs, its
+# implicit dependencies and the environment variables it uses. When enabled,
+# the signature components of each task that runs are saved in a file in the
+# BSP's build directory. The next time a task runs its components are compared
+# to the saved components to explain why it ran. A summary of the causes is
+# printed and all the tasks and their causes are written to a report in the
+# BSP's build directory.
+#
+
+import os
+import threading
+
+from waflib import Logs, Options, Task, Utils
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+explain_file = 'rtems-explain.db'
+report_file = 'rtems-explain.txt'
+
+#
+# The compiled and link task classes.
+#
+task_classes = [
+    'c', 'cxx', 'asm', 'cprogram', 'cxxprogram', 'cstlib', 'cxxstlib',
+    'cshlib', 'cxxshlib', 'rap', 'rtrace'
+]
+
+_lock = threading.Lock()
+_wrapped = []
+
+
+def options(opt):
+    opt.add_option_group('rebuild explain options')
+    eopts = opt.get_option_group('rebuild explain options')
+    eopts.add_option('--rtems-explain',
+                     action='store_true',
+                     default=False,
+                     dest='rtems_explain',
+                     help='Explain why each task is run.')
+
+
+def _sig(node):
+    try:
+        return node.get_bld_sig()
+    except Exception:
+        return None
+
+
+def components(tsk):
+    '''Return the signature components of the task.'''
+    bld = tsk.generator.bld
+    inputs = {}
+    for node in tsk.inputs + list(getattr(tsk, 'dep_nodes', [])):
+        inputs[node.abspath()] = _sig(node)
+    implicit = {}
+    for node in bld.node_deps.get(tsk.uid(), []):
+        implicit[node.abspath()] = _sig(node)
+    env = {}
+    for var in tsk.vars:
+        env[var] = Utils.h_list(tsk.env[var])
+    return {
+        'hcode': Utils.h_list(getattr(tsk, 'hcode', '')),
+        'inputs': inputs,
+        'implicit': implicit,
+        'env': env
+    }
+
+
+def _changes(label, prev, now):
+    causes = []
+    for key in sorted(now):
+        if key not in prev:
+            causes += ['%s added: %s' % (label, key)]
+        elif prev[key] != now[key]:
+            causes += ['%s changed: %s' % (label, key)]
+    for key in sorted(prev):
+        if key not in now:
+            causes += ['%s removed: %s' % (label, key)]
+    return causes
+
+
+def causes(prev, now):
+    '''Return the causes of a task running given its previous and current
+    signature components.'''
+    if prev is None:
+        return ['no previous signature']
+    causes = []
+    if prev['hcode'] != now['hcode']:
+        causes += ['task command changed']
+    causes += _changes('input', prev['inputs'], now['inputs'])
+    causes += _changes('dependency', prev['implicit'], now['implicit'])
+    causes += _changes('env', prev['env'], now['env'])
+    if len(causes) == 0:
+        causes = ['outputs missing or the previous run failed']
+    return causes
+
+
+class explain(object):
+    '''The explanations of a build.'''
+    def __init__(self, bld):
+        self.bld = bld
+        self.path = os.path.join(bld.variant_dir, explain_file)
+        self.sigs = {}
+        self.ran = []
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, 'rb') as f:
+                self.sigs = pickle.load(f)
+        except Exception:
+            self.sigs = {}
+
+    def run(self, tsk):
+        '''The task is about to run, explain why.'''
+        uid = tsk.uid()
+        why = causes(self.sigs.get(uid), components(tsk))
+        with self.lock:
+            self.ran += [(tsk, why)]
+
+    def write(self):
+        counts = {}
+        lines = []
+        for tsk, why in self.ran:
+            if tsk.hasrun != Task.SUCCESS:
+                continue
+            self.sigs[tsk.uid()] = components(tsk)
+            lines += ['%s' % (', '.join([n.abspath() for n in tsk.outputs]))]
+            for cause in why:
+                lines += ['  ' + cause]
+                counts[cause] = counts.get(cause, 0) + 1
+        with open(self.path, 'wb') as f:
+            pickle.dump(self.sigs, f, -1)
+        with open(os.path.join(self.bld.variant_dir, report_file), 'w') as f:
+            f.write(os.linesep.join(lines) + os.linesep)
+        Logs.info('Explain: %d task(s) ran, report: %s' %
+                  (len(self.ran),
+                   os.path.join(self.bld.variant_dir, report_file)))
+        top = sorted(counts.items(), key=lambda c: (-c[1], c[0]))
+        for cause, count in top[:20]:
+            Logs.info(' %6d  %s' % (count, cause))
+
+
+def _explain(bld):
+    try:
+        return bld.rtems_explain
+    except AttributeError:
+        with _lock:
+            try:
+                return bld.rtems_explain
+            except AttributeError:
+                bld.rtems_explain = explain(bld)
+        return bld.rtems_explain
+
+
+def runnable_status(self):
+    ret = super(self.derived_explain, self).runnable_status()
+    if ret == Task.RUN_ME:
+        _explain(self.generator.bld).run(self)
+    return ret
+
+
+def _write(bld):
+    try:
+        bld.rtems_explain.write()
+    except AttributeError:
+        pass
+
+
+def wrap(classes=task_classes):
+    '''Wrap the task classes to explain why they run.'''
+    for k in classes:
+        cls = Task.classes.get(k)
+        if cls is None or k in _wrapped:
+            continue
+        derived_class = type(k, (cls, ), {})
+        derived_class.derived_explain = derived_class
+        derived_class.runnable_status = runnable_status
+        if hasattr(cls, 'hcode'):
+            derived_class.hcode = cls.hcode
+        _wrapped.append(k)
+
+
+def enable(bld):
+    '''Explain the build's tasks if the option is set.'''
+    if getattr(Options.options, 'rtems_explain', False):
+        wrap()
+        bld.add_post_fun(_write)
@@ -15,11 +15,16 @@ Usage::
 		conf.load('compiler_cxx gccdeps')
 """
 
-import os, re, threading
-from waflib import Task, Logs, Utils, Errors
+import io, os, re, threading, time
+from waflib import Build, Task, Logs, Utils, Errors
 from waflib.Tools import c_preproc
 from waflib.TaskGen import before_method, feature
 
+try:
+	from queue import Queue, Empty
+except ImportError:
+	from Queue import Queue, Empty
+
 lock = threading.Lock()
 
 gccdeps_flags = ['-MD']
@@ -29,8 +34,23 @@ if not c_preproc.go_absolute:
 # Third-party tools are allowed to add extra names in here with append()
 supported_compilers = ['gcc', 'icc', 'clang']
 
+# The compiler driver only writes a .d file for an assembler source it
+# preprocesses. The assembler does not preprocess a plain .s source so it has
+# no dependencies and is not scanned
+preprocessed_asm = ('.S', '.sx')
+
+def uses_gccdeps(self):
+	name = self.__class__.__name__
+	if not name in self.env.ENABLE_GCCDEPS:
+		return False
+	if name == 'asm':
+		return self.inputs[0].name.endswith(preprocessed_asm)
+	return True
+
 def scan(self):
-	if not self.__class__.__name__ in self.env.ENABLE_GCCDEPS:
+	if not uses_gccdeps(self):
+		if self.__class__.__name__ == 'asm' and not self.inputs[0].name.endswith(preprocessed_asm):
+			return ([], [])
 		return super(self.derived_gccdeps, self).scan()
 	nodes = self.generator.bld.node_deps.get(self.uid(), [])
 	names = []
@@ -52,38 +72,7 @@ def remove_makefile_rule_lhs(line):
 	else:
 		return line
 
-def path_to_node(base_node, path, cached_nodes):
-	# Take the base node and the path and return a node
-	# Results are cached because searching the node tree is expensive
-	# The following code is executed by threads, it is not safe, so a lock is needed...
-	if getattr(path, '__hash__'):
-		node_lookup_key = (base_node, path)
-	else:
-		# Not hashable, assume it is a list and join into a string
-		node_lookup_key = (base_node, os.path.sep.join(path))
-	try:
-		lock.acquire()
-		node = cached_nodes[node_lookup_key]
-	except KeyError:
-		node = base_node.find_resource(path)
-		cached_nodes[node_lookup_key] = node
-	finally:
-		lock.release()
-	return node
-
-def post_run(self):
-	if not self.__class__.__name__ in self.env.ENABLE_GCCDEPS:
-		return super(self.derived_gccdeps, self).post_run()
-
-	name = self.outputs[0].abspath()
-	name = re_o.sub('.d', name)
-	try:
-		txt = Utils.readf(name)
-	except EnvironmentError:
-		Logs.error('Could not find a .d dependency file, are cflags/cxxflags overwritten?')
-		raise
-	#os.remove(name)
-
+def dep_paths(lines):
 	# Compilers have the choice to either output the file's dependencies
 	# as one large Makefile rule:
 	#
@@ -99,16 +88,178 @@ def post_run(self):
 	#   /path/to/file.o: /path/to/dep3.h
 	#   ...
 	#
-	# So the first step is to sanitize the input by stripping out the left-
-	# hand side of all these lines. After that, whatever remains are the
-	# implicit dependencies of task.outputs[0]
-	txt = '\n'.join([remove_makefile_rule_lhs(line) for line in txt.splitlines()])
+	# The lines are read once and the left-hand side of each line is
+	# stripped. A path continued on the next line is carried over and the
+	# paths of each line are yielded. Whatever remains are the implicit
+	# dependencies of task.outputs[0]
+	carry = ''
+	for line in lines:
+		line = remove_makefile_rule_lhs(line).rstrip('\r\n')
+		if carry:
+			line = carry + line
+			carry = ''
+		if line.endswith('\\'):
+			line = line[:-1]
+			if line and (not line[-1].isspace() or line[-2:-1] == '\\'):
+				# the last path continues on the next line
+				carry = line
+				continue
+		if '\\' in line:
+			paths = [x.replace('\\ ', ' ') for x in re_splitter.split(line) if x]
+		else:
+			paths = line.split()
+		for x in paths:
+			yield x
+	if carry:
+		for x in re_splitter.split(carry):
+			if x:
+				yield x.replace('\\ ', ' ')
+
+def read_deps(name):
+	# Read the dependencies from the .d file, the file is only opened when the
+	# paths are iterated
+	try:
+		f = io.open(name, 'r', encoding='latin-1')
+	except EnvironmentError:
+		Logs.error('Could not find a .d dependency file, are cflags/cxxflags overwritten?')
+		raise
+	with f:
+		for x in dep_paths(f):
+			yield x
+
+def path_to_node(base_node, path, cached_nodes):
+	# Take the base node and the path and return a node
+	# Results are cached because searching the node tree is expensive
+	# The following code is executed by threads. The cache holds a dictionary
+	# of paths for each base node and is read without the lock, reading a
+	# dictionary is atomic. The lock is only taken on a miss, to search the
+	# node tree and add the result, and the cache is checked again under it.
+	if getattr(path, '__hash__'):
+		key = path
+	else:
+		# Not hashable, assume it is a list and join into a string
+		key = os.path.sep.join(path)
+	try:
+		return cached_nodes[base_node][key]
+	except KeyError:
+		pass
+	with lock:
+		try:
+			nodes = cached_nodes[base_node]
+		except KeyError:
+			nodes = cached_nodes[base_node] = {}
+		try:
+			node = nodes[key]
+		except KeyError:
+			node = base_node.find_resource(path)
+			nodes[key] = node
+	return node
+
+def intern_deps(bld, nodes):
+	# Most objects share the same headers so the dependency lists are held as
+	# shared tuples. The build state stores a shared tuple once. The table is
+	# seeded with the tuples loaded from the build state
+	nodes = tuple(nodes)
+	try:
+		interned = bld.gccdeps_interned
+	except AttributeError:
+		with lock:
+			try:
+				interned = bld.gccdeps_interned
+			except AttributeError:
+				interned = {}
+				for deps in list(bld.node_deps.values()):
+					if isinstance(deps, tuple):
+						interned.setdefault(deps, deps)
+				bld.gccdeps_interned = interned
+	return interned.setdefault(nodes, nodes)
+
+class ingest(object):
+	# Ingest the dependencies of tasks in a background thread. The tasks are
+	# taken in batches and the dependencies and the task signature are
+	# committed as post_run does. The build context's store flushes the
+	# pending tasks and stops the thread before the build state is saved and
+	# fails the build if a task's dependencies could not be ingested
+	def __init__(self, bld):
+		self.bld = bld
+		self.queue = Queue()
+		self.errors = []
+		self.thread = threading.Thread(target=self.run)
+		self.thread.daemon = True
+		self.thread.start()
+
+	def put(self, tsk):
+		self.queue.put(tsk)
+
+	def run(self):
+		while True:
+			batch = [self.queue.get()]
+			try:
+				while True:
+					batch.append(self.queue.get_nowait())
+			except Empty:
+				pass
+			for tsk in batch:
+				if tsk is None:
+					self.queue.task_done()
+					return
+				try:
+					ingest_deps(tsk)
+				except Exception as e:
+					self.errors.append((tsk, e))
+				self.queue.task_done()
+
+	def flush(self):
+		self.queue.put(None)
+		self.thread.join()
+		for tsk, e in self.errors:
+			# the task runs again in the next build
+			try:
+				del self.bld.task_sigs[tsk.uid()]
+			except KeyError:
+				pass
+		return self.errors
+
+def deferred(bld):
+	try:
+		return bld.gccdeps_ingest
+	except AttributeError:
+		with lock:
+			try:
+				return bld.gccdeps_ingest
+			except AttributeError:
+				bld.gccdeps_ingest = ingest(bld)
+		return bld.gccdeps_ingest
+
+def flush(bld):
+	# Wait for the pending tasks and stop the thread, a later build starts a
+	# new thread
+	with lock:
+		queue = bld.__dict__.pop('gccdeps_ingest', None)
+	if queue is None:
+		return []
+	return queue.flush()
 
-	# Now join all the lines together
-	txt = txt.replace('\\\n', '')
+def post_run(self):
+	if not uses_gccdeps(self):
+		return super(self.derived_gccdeps, self).post_run()
 
-	val = txt.strip()
-	val = [x.replace('\\ ', ' ') for x in re_splitter.split(val) if x]
+	if self.env.GCCDEPS_DEFERRED:
+		for node in self.outputs:
+			if not os.path.exists(node.abspath()):
+				self.hasrun = Task.MISSING
+				self.err_msg = '-> missing file: %r' % node.abspath()
+				raise Errors.WafError(self.err_msg)
+		deferred(self.generator.bld).put(self)
+		return
+
+	ingest_deps(self)
+
+def ingest_deps(self):
+	name = self.outputs[0].abspath()
+	name = re_o.sub('.d', name)
+	val = read_deps(name)
+	#os.remove(name)
 
 	nodes = []
 	bld = self.generator.bld
@@ -150,9 +301,14 @@ def post_run(self):
 
 	Logs.debug('deps: gccdeps for %s returned %s', self, nodes)
 
-	bld.node_deps[self.uid()] = nodes
+	bld.node_deps[self.uid()] = intern_deps(bld, nodes)
 	bld.raw_deps[self.uid()] = []
 
+	# Keep the target and compile time if the build state holds them
+	stats = getattr(bld, 'gccdeps_stats', None)
+	if stats is not None:
+		stats[self.uid()] = (self.outputs[0].abspath(), getattr(self, 'gccdeps_secs', 0.0))
+
 	try:
 		del self.cache_sig
 	except AttributeError:
@@ -160,22 +316,124 @@ def post_run(self):
 
 	Task.Task.post_run(self)
 
+def run(self):
+	start = time.time()
+	try:
+		return super(self.derived_gccdeps, self).run()
+	finally:
+		self.gccdeps_secs = time.time() - start
+
 def sig_implicit_deps(self):
-	if not self.__class__.__name__ in self.env.ENABLE_GCCDEPS:
+	if not uses_gccdeps(self):
 		return super(self.derived_gccdeps, self).sig_implicit_deps()
 	try:
 		return Task.Task.sig_implicit_deps(self)
 	except Errors.WafError:
 		return Utils.SIG_NIL
 
+def immutable_sig(bld, stamps, trees=()):
+	# The dependencies under the immutable prefixes are represented by a
+	# single signature of the stamp files and of every file in the trees, for
+	# example the installed BSP's files and headers. A header installed or
+	# replaced in a tree, for example by a third-party package installed in
+	# the same prefix, changes the signature. The signature is created once
+	# per build
+	key = (tuple(stamps), tuple(trees))
+	try:
+		cache = bld.gccdeps_immutable_sigs
+	except AttributeError:
+		cache = bld.gccdeps_immutable_sigs = {}
+	try:
+		return cache[key]
+	except KeyError:
+		pass
+	m = Utils.md5()
+	def stamp(path):
+		m.update(path.encode('utf-8'))
+		try:
+			st = os.stat(path)
+		except OSError:
+			m.update(b'-')
+		else:
+			m.update(repr((st.st_mtime, st.st_size)).encode('utf-8'))
+	for path in key[0]:
+		stamp(path)
+	for tree in key[1]:
+		for root, dirs, files in os.walk(tree):
+			dirs.sort()
+			for name in sorted(files):
+				stamp(os.path.join(root, name))
+	sig = cache[key] = m.digest()
+	return sig
+
+def is_immutable(bld, prefixes, node):
+	# Return True if the node is under one of the immutable prefixes and not
+	# in the project's source or build tree. The result is cached per build
+	key = tuple(prefixes)
+	try:
+		caches = bld.gccdeps_immutable_nodes
+	except AttributeError:
+		caches = bld.gccdeps_immutable_nodes = {}
+	cache = caches.setdefault(key, {})
+	try:
+		return cache[node]
+	except KeyError:
+		pass
+	if node.is_child_of(bld.srcnode) or node.is_child_of(bld.bldnode):
+		ret = False
+	else:
+		path = node.abspath()
+		ret = False
+		for prefix in key:
+			if path.startswith(prefix.rstrip(os.sep) + os.sep):
+				ret = True
+				break
+	cache[node] = ret
+	return ret
+
+def compute_sig_implicit_deps(self):
+	if not uses_gccdeps(self) or not self.env.GCCDEPS_IMMUTABLE:
+		return super(self.derived_gccdeps, self).compute_sig_implicit_deps()
+	bld = self.generator.bld
+	upd = self.m.update
+	self.are_implicit_nodes_ready()
+	upd(immutable_sig(bld, self.env.GCCDEPS_IMMUTABLE_STAMPS, self.env.GCCDEPS_IMMUTABLE_TREES))
+	prefixes = self.env.GCCDEPS_IMMUTABLE
+	for k in bld.node_deps.get(self.uid(), []):
+		if not is_immutable(bld, prefixes, k):
+			upd(k.get_bld_sig())
+	return self.m.digest()
+
+def store(self):
+	errors = flush(self)
+	# Attributes added to the saved attributes after the context was created
+	for x in Build.SAVED_ATTRS:
+		if not hasattr(self, x):
+			setattr(self, x, {})
+	self.gccdeps_store()
+	if errors:
+		raise Errors.WafError('gccdeps: could not ingest the dependencies of:\n' +
+			'\n'.join('  %s: %s' % (tsk, e) for tsk, e in errors))
+
+if not hasattr(Build.BuildContext, 'gccdeps_store'):
+	Build.BuildContext.gccdeps_store = Build.BuildContext.store
+	Build.BuildContext.store = store
+
 def wrap_compiled_task(classname):
+	# Wrap a compiled task class, a task class registered by a user can be
+	# wrapped if its compiler generates the .d files. A class is only wrapped
+	# once
+	if getattr(Task.classes[classname], 'derived_gccdeps', None) is Task.classes[classname]:
+		return
 	derived_class = type(classname, (Task.classes[classname],), {})
 	derived_class.derived_gccdeps = derived_class
 	derived_class.post_run = post_run
+	derived_class.run = run
 	derived_class.scan = scan
 	derived_class.sig_implicit_deps = sig_implicit_deps
+	derived_class.compute_sig_implicit_deps = compute_sig_implicit_deps
 
-for k in ('c', 'cxx'):
+for k in ('c', 'cxx', 'asm'):
 	if k in Task.classes:
 		wrap_compiled_task(k)
 
@@ -184,6 +442,30 @@ for k in ('c', 'cxx'):
 def force_gccdeps(self):
 	self.env.ENABLE_GCCDEPS = ['c', 'cxx']
 
+def is_compiler_driver(path):
+	# The assembler is a compiler driver that generates the .d files, for
+	# example sparc-rtems6-gcc
+	name = os.path.basename(path).lower()
+	return 'gcc' in name or 'clang' in name
+
+def check_flags(conf, lang, flags, **kw):
+	# The results are kept in GCCDEPS_CHECKS, a configure that has the results
+	# of an earlier configure, for example from a configure cache, sets it so
+	# the compiler is not run again
+	checks = conf.env.GCCDEPS_CHECKS or {}
+	msg = 'Checking for %s flags %r' % (lang, ''.join(flags))
+	if lang in checks:
+		conf.msg(msg, checks[lang] and 'yes (cached)')
+	else:
+		try:
+			conf.check(fragment='int main() { return 0; }', features='%s force_gccdeps' % lang, msg=msg, **kw)
+		except Errors.ConfigurationError:
+			checks[lang] = False
+		else:
+			checks[lang] = True
+		conf.env.GCCDEPS_CHECKS = checks
+	return checks[lang]
+
 def configure(conf):
 	# in case someone provides a --enable-gccdeps command-line option
 	if not getattr(conf.options, 'enable_gccdeps', True):
@@ -192,23 +474,22 @@ def configure(conf):
 	global gccdeps_flags
 	flags = conf.env.GCCDEPS_FLAGS or gccdeps_flags
 	if conf.env.CC_NAME in supported_compilers:
-		try:
-			conf.check(fragment='int main() { return 0; }', features='c force_gccdeps', cflags=flags, msg='Checking for c flags %r' % ''.join(flags))
-		except Errors.ConfigurationError:
-			pass
-		else:
+		if check_flags(conf, 'c', flags, cflags=flags):
 			conf.env.append_value('CFLAGS', flags)
 			conf.env.append_unique('ENABLE_GCCDEPS', 'c')
 
 	if conf.env.CXX_NAME in supported_compilers:
-		try:
-			conf.check(fragment='int main() { return 0; }', features='cxx force_gccdeps', cxxflags=flags, msg='Checking for cxx flags %r' % ''.join(flags))
-		except Errors.ConfigurationError:
-			pass
-		else:
+		if check_flags(conf, 'cxx', flags, cxxflags=flags):
 			conf.env.append_value('CXXFLAGS', flags)
 			conf.env.append_unique('ENABLE_GCCDEPS', 'cxx')
 
+	# The .S assembler sources are preprocessed by the compiler driver, use
+	# the flags the C compiler accepted. The .s sources are not scanned
+	if conf.env.ASM_NAME == 'gas' and 'c' in conf.env.ENABLE_GCCDEPS and conf.env.AS:
+		if is_compiler_driver(Utils.to_list(conf.env.AS)[0]):
+			conf.env.append_value('ASFLAGS', flags)
+			conf.env.append_unique('ENABLE_GCCDEPS', 'asm')
+
 def options(opt):
 	raise ValueError('Do not load gccdeps options')
 
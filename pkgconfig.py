@@ -10,8 +10,18 @@
 # would be portable and I suspect useful to others on platforms other than
 # Linux or Unix equivs that contain the required packages.
 #
+import os
 import re
 
+#
+# Parsed files are cached by path and checked using the file's modified time
+# and size so a file is only parsed once per process.
+#
+_cache = {}
+
+_var_re = re.compile(r'\$\{([^\}]+)\}')
+_requires_re = re.compile(r'([^\s,<>=!]+)(?:\s*(<=|>=|!=|=|<|>)\s*([^\s,]+))?')
+
 
 class error(Exception):
     def __init__(self, msg):
@@ -21,67 +31,136 @@ class error(Exception):
         return self.msg
 
 
+def _parse(text):
+    defines = {}
+    fields = {}
+    for l in text.split('\n'):
+        if '#' in l:
+            l = l[:l.find('#')]
+        #
+        # A define is `name=value` and a field is `name: value`, the first of
+        # the `=` or `:` separates the name. A line starting with `=` is
+        # ignored.
+        #
+        eq = l.find('=')
+        dd = l.find(':')
+        if eq >= 0 and not 0 < dd < eq:
+            if eq > 0:
+                defines[l[:eq].lower()] = l[eq + 1:]
+        elif dd > 0:
+            fields[l[:dd].lower()] = l[dd + 1:]
+    return defines, fields
+
+
+def _load(file):
+    '''Load a file using the cache. The returned dictionaries are shared. The
+    cache is read and updated without a lock, a dictionary's get and set are
+    atomic and a file parsed by two threads at once gives the same result.'''
+    st = os.stat(file)
+    key = (st.st_mtime, st.st_size)
+    entry = _cache.get(file)
+    if entry is not None and entry[0] == key:
+        return entry[1], entry[2]
+    with open(file) as f:
+        defines, fields = _parse(f.read())
+    _cache[file] = (key, defines, fields)
+    return defines, fields
+
+
+#
+# Marks a define being expanded so a define that refers to itself is left in
+# place.
+#
+_expanding = object()
+
+
 class package:
-    def __init__(self, file=None):
+    def __init__(self, file=None, paths=[]):
         self.defines = {}
         self.fields = {}
+        self.file = None
+        self.paths = paths
+        self._expanded = {}
         if file:
             self.load(file)
 
     def load(self, file):
-        f = open(file)
-        tm = False
-        for l in f.readlines():
-            l = l[:-1]
-            hash = l.find('#')
-            if hash >= 0:
-                l = l[:hash]
-            if len(l):
-                d = 0
-                define = False
-                eq = l.find('=')
-                dd = l.find(':')
-                if eq > 0 and dd > 0:
-                    if eq < dd:
-                        define = True
-                        d = eq
-                    else:
-                        define = False
-                        d = dd
-                elif eq >= 0:
-                    define = True
-                    d = eq
-                elif dd >= 0:
-                    define = False
-                    d = dd
-                if d > 0:
-                    lhs = l[:d].lower()
-                    rhs = l[d + 1:]
-
-                    if tm:
-                        print('define: ' + str(define) + ', lhs: ' + lhs +
-                              ', ' + rhs)
-
-                    if define:
-                        self.defines[lhs] = rhs
-                    else:
-                        self.fields[lhs] = rhs
+        defines, fields = _load(file)
+        self.defines = dict(defines)
+        self.fields = dict(fields)
+        self.file = file
+        self._expanded = {}
+
+    def _expand(self, s):
+        '''Expand the variables in a single pass. A define's value is expanded
+        once and remembered. Undefined variables are left in place.'''
+        if '${' not in s:
+            return s
+        return _var_re.sub(self._define, s)
+
+    def _define(self, m):
+        name = m.group(1).lower()
+        value = self._expanded.get(name)
+        if value is None:
+            value = self.defines.get(name)
+            if value is None:
+                return m.group(0)
+            self._expanded[name] = _expanding
+            value = self._expand(value)
+            self._expanded[name] = value
+        elif value is _expanding:
+            return m.group(0)
+        return value
 
     def get(self, label):
         if label.lower() not in self.fields:
             raise error('Label not found: ' + label)
-        mre = re.compile('\$\{[^\}]+\}')
-        s = self.fields[label.lower()]
-        expanded = True
-        tm = False
-        while expanded:
-            expanded = False
-            if tm:
-                print('pc:get: "' + s + '"')
-            ms = mre.findall(s)
-            for m in ms:
-                mn = m[2:-1]
-                if mn.lower() in self.defines:
-                    s = s.replace(m, self.defines[mn.lower()])
-                    expanded = True
-        return s
+        return self._expand(self.fields[label.lower()])
+
+    def requires(self, private=False):
+        '''Return the names of the required packages.'''
+        label = 'requires'
+        if private:
+            label = 'requires.private'
+        if label not in self.fields:
+            return []
+        return [m.group(1) for m in _requires_re.finditer(self.get(label))]
+
+    def find(self, name):
+        '''Find a package's file in this package's directory and the search
+        paths.'''
+        paths = []
+        if self.file is not None:
+            paths += [os.path.dirname(self.file)]
+        for path in paths + list(self.paths):
+            pc = os.path.join(path, name + '.pc')
+            if os.path.exists(pc):
+                return pc
+        raise error('Package not found: ' + name)
+
+    def resolve(self, label, private=False):
+        '''Return the label's value with the values of the required packages
+        appended. If private is True the private requirements are included
+        and the label's private value, for example `Libs.private`, is appended
+        to the label's value.'''
+        return ' '.join(self._resolve(label, private, set()))
+
+    def _resolve(self, label, private, seen):
+        values = []
+        labels = [label]
+        if private:
+            labels += [label + '.private']
+        for l in labels:
+            if l.lower() in self.fields:
+                value = self.get(l).strip()
+                if len(value):
+                    values += [value]
+        names = self.requires()
+        if private:
+            names += self.requires(private=True)
+        for name in names:
+            if name not in seen:
+                seen.add(name)
+                pkg = package(self.find(name), self.paths)
+                values += pkg._resolve(label, private, seen)
+        return values
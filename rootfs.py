@@ -24,7 +24,36 @@
 #  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 #  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import hashlib
+import json
+import mmap
 import os
+import re
+import struct
+import tarfile
+import threading
+import time
+import zlib
+
+from waflib import Logs
+from waflib import Options
+from waflib import TaskGen
+from waflib import Utils
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+def options(opt):
+    opt.add_option_group('root file system options')
+    ropts = opt.get_option_group('root file system options')
+    ropts.add_option(
+        '--rtems-rootfs-jobs',
+        default=None,
+        dest='rtems_rootfs_jobs',
+        help='Number of rootfs gzip compression threads (default 1).')
 
 
 def join(*paths):
@@ -53,28 +82,755 @@ def tar(ctx, name, root, target, source, depends_on):
         color='CYAN')
 
 
+def tar_members(files):
+    '''Return the tar members of the files. The files are pairs of the source
+    node and the target path. The members are the directories and files
+    sorted by path with the directories before the files in them. A path
+    used by more than one file, or by a file and a directory, is an
+    error.'''
+    members = {'.': None}
+    dirs = set(['.'])
+    for src, dst in files:
+        dst = os.path.normpath(dst).replace(os.sep, '/')
+        if dst.startswith('/') or dst == '..' or dst.startswith('../'):
+            raise ValueError('rootfs path is not relative to the root: %s' %
+                             (dst))
+        path = '.'
+        for d in dst.split('/')[:-1]:
+            path += '/' + d
+            if path in members and path not in dirs:
+                raise ValueError('rootfs path is a file and a directory: %s' %
+                                 (path[2:]))
+            members[path] = None
+            dirs.add(path)
+        path = './' + dst
+        if path in dirs:
+            raise ValueError('rootfs path is a file and a directory: %s' %
+                             (dst))
+        if path in members:
+            raise ValueError('rootfs path is in the tar file more than once: %s'
+                             % (dst))
+        members[path] = src
+    return sorted(members.items())
+
+
+def _member(node):
+    '''Return the tar member of a node using the path relative to the top of
+    the source or build tree. The member's separator is `/` on all hosts.'''
+    return '/'.join(node.relpath().split(os.sep))
+
+
+#
+# The tar file formats.
+#
+formats = {'gnu': tarfile.GNU_FORMAT, 'ustar': tarfile.USTAR_FORMAT}
+
+#
+# The manifest is held next to the tar file and records the offset, length,
+# header and content hash of each member so a tar file can be updated in
+# place.
+#
+manifest_version = 1
+
+
+def _padded(size):
+    blocks, remainder = divmod(size, tarfile.BLOCKSIZE)
+    if remainder != 0:
+        blocks += 1
+    return blocks * tarfile.BLOCKSIZE
+
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(1 << 20), b''):
+            h.update(data)
+    return h.hexdigest()
+
+
+def _manifest_load(path, format):
+    try:
+        with open(path + '.manifest', 'r') as f:
+            manifest = json.load(f)
+        st = os.stat(path)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or \
+       manifest.get('version') != manifest_version or \
+       manifest.get('format') != format or \
+       manifest.get('size') != st.st_size or \
+       manifest.get('mtime') != st.st_mtime:
+        return None
+    return manifest
+
+
+def _manifest_store(path, format, entries):
+    st = os.stat(path)
+    manifest = {
+        'version': manifest_version,
+        'format': format,
+        'size': st.st_size,
+        'mtime': st.st_mtime,
+        'members': [dict([(k, e[k]) for k in e if k not in ['src', 'buf']])
+                    for e in entries]
+    }
+    with open(path + '.manifest', 'w') as f:
+        json.dump(manifest, f)
+
+
+def _tar_entries(members, manifest, format):
+    '''Return the entries of the members with the header of each. A file's
+    content is only hashed if its stamp is not the stamp in the manifest and
+    a file with unchanged content keeps the modified time it has in the tar
+    file so the tar file only changes if the content changes.'''
+    prev = {}
+    if manifest is not None:
+        prev = dict([(e['name'], e) for e in manifest['members']])
+    entries = []
+    for member, src in members:
+        e = {'name': member, 'src': src, 'size': 0, 'sha1': None}
+        if src is not None:
+            st = os.stat(src.abspath())
+            stamp = [st.st_mtime, st.st_size]
+            p = prev.get(member, {})
+            if p.get('stamp') == stamp:
+                e['sha1'] = p['sha1']
+            else:
+                e['sha1'] = _file_sha1(src.abspath())
+            if p.get('sha1') == e['sha1']:
+                e['mtime'] = p['mtime']
+            else:
+                e['mtime'] = int(st.st_mtime)
+            e['stamp'] = stamp
+            e['size'] = st.st_size
+            e['mode'] = st.st_mode & 0o7777
+        entries += [e]
+    mtime = max([0] + [e['mtime'] for e in entries if e['src'] is not None])
+    offset = 0
+    for e in entries:
+        if e['src'] is None:
+            info = tarfile.TarInfo(e['name'] + '/')
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            info.mtime = mtime
+        else:
+            info = tarfile.TarInfo(e['name'])
+            info.size = e['size']
+            info.mode = e['mode']
+            info.mtime = e['mtime']
+        info.uid = info.gid = 0
+        info.uname = info.gname = 'root'
+        e['buf'] = info.tobuf(formats[format], tarfile.ENCODING,
+                              'surrogateescape')
+        e['header'] = hashlib.sha1(e['buf']).hexdigest()
+        e['offset'] = offset
+        e['length'] = len(e['buf']) + _padded(e['size'])
+        offset += e['length']
+    return entries, offset
+
+
+def _write_entry(f, e):
+    f.write(e['buf'])
+    if e['src'] is not None:
+        size = e['size']
+        with open(e['src'].abspath(), 'rb') as src:
+            while size > 0:
+                data = src.read(min(size, 1 << 20))
+                if len(data) == 0:
+                    raise IOError('rootfs file changed size: %s' %
+                                  (e['src'].abspath()))
+                f.write(data)
+                size -= len(data)
+        f.write(tarfile.NUL * (_padded(e['size']) - e['size']))
+
+
+def tar_write(path, members, format='gnu'):
+    '''Write a tar file of the members streaming each file into the tar
+    file. The owner is normalised so the tar file only depends on the files.
+
+    The tar file is updated in place if it has a valid manifest. Members
+    that have changed and have the same length in the tar file are
+    rewritten in place and the tar file is rewritten from the first member
+    with a different name or length. Nothing is written if the tar file is
+    unchanged. Returns True if the tar file was written.
+    '''
+    manifest = _manifest_load(path, format)
+    entries, end = _tar_entries(members, manifest, format)
+    size = _padded(end + 2 * tarfile.BLOCKSIZE)
+    blocks, remainder = divmod(size, tarfile.RECORDSIZE)
+    if remainder != 0:
+        size = (blocks + 1) * tarfile.RECORDSIZE
+    if manifest is None:
+        old = []
+        first = 0
+    else:
+        old = manifest['members']
+        first = 0
+        while first < len(entries) and first < len(old) and \
+              entries[first]['name'] == old[first]['name'] and \
+              entries[first]['length'] == old[first]['length']:
+            first += 1
+    update = [
+        e for e, o in zip(entries[:first], old)
+        if e['header'] != o['header'] or e['sha1'] != o['sha1']
+    ]
+    rewrite = manifest is None or first != len(entries) or \
+        len(old) != len(entries)
+    if not rewrite and len(update) == 0:
+        return False
+    with open(path, 'wb' if manifest is None else 'r+b') as f:
+        for e in update:
+            f.seek(e['offset'])
+            _write_entry(f, e)
+        if rewrite:
+            if first < len(entries):
+                f.seek(entries[first]['offset'])
+            else:
+                f.seek(end)
+            for e in entries[first:]:
+                _write_entry(f, e)
+            f.write(tarfile.NUL * (size - end))
+            f.truncate()
+    _manifest_store(path, format, entries)
+    return True
+
+
+def _tar_task(task):
+    members = task.env.ROOTFS_TAR_MEMBERS
+    if members:
+        members = tar_members(zip(task.inputs, members))
+    else:
+        members = [(_member(src), src) for src in task.inputs]
+        names = set()
+        for name, src in members:
+            if name in names:
+                raise ValueError(
+                    'rootfs path is in the tar file more than once: %s' %
+                    (name))
+            names.add(name)
+    tar_write(task.outputs[0].abspath(), members, task.env.ROOTFS_TAR_FORMAT)
+
+
+@TaskGen.feature('rootfs_tar')
+@TaskGen.before_method('process_rule')
+def rootfs_tar_env(self):
+    self.env.ROOTFS_TAR_MEMBERS = getattr(self, 'rootfs_members', [])
+    self.env.ROOTFS_TAR_FORMAT = getattr(self, 'rootfs_format', 'gnu')
+
+
+def tar_file(ctx, name, target, source, members=None, format='gnu'):
+    '''Add a task to write a tar file of the source files. The members are
+    the paths of the source files in the tar file and the directories in the
+    paths are added. If there are no members the source files are added
+    using their paths relative to the top of the source or build tree.'''
+    if members:
+        try:
+            tar_members([(None, str(m)) for m in members])
+        except ValueError as e:
+            ctx.fatal(str(e))
+    return ctx(features='rootfs_tar',
+               rule=_tar_task,
+               name=name,
+               target=target,
+               source=source,
+               rootfs_members=members or [],
+               rootfs_format=format,
+               vars=['ROOTFS_TAR_MEMBERS', 'ROOTFS_TAR_FORMAT'],
+               color='CYAN')
+
+
+#
+# The data is converted in chunks of whole lines of 16 bytes.
+#
+_bin2c_chunk = 1024 * 1024
+
+try:
+    b''.hex(',')
+
+    def _hex_values(data):
+        return '0x' + data.hex(',').replace(',', ',0x') + ','
+except (AttributeError, TypeError):
+    _hex_table = ['0x%02x,' % (b) for b in range(256)]
+
+    def _hex_values(data):
+        return ''.join([_hex_table[b] for b in bytearray(data)])
+
+
+_c_template = '''/*
+ * Data of %(name)s. Automatically generated -- do not edit!
+ */
+
+#include <stddef.h>
+
+const unsigned char %(sym)s[] = {
+'''
+
+_c_binary_template = '''
+__asm__(
+  "\\t.global %(binary)s_start\\n"
+  "\\t.set %(binary)s_start, %(sym)s\\n"
+  "\\t.global %(binary)s_end\\n"
+  "\\t.set %(binary)s_end, %(sym)s + %(size)d\\n"
+  "\\t.global %(binary)s_size\\n"
+  "\\t.set %(binary)s_size, %(size)d\\n");
+'''
+
+_h_template = '''/*
+ * Declarations for %(name)s. Automatically generated -- do not edit!
+ */
+
+#ifndef %(guard)s
+#define %(guard)s
+
+#include <stddef.h>
+
+extern const unsigned char %(sym)s[];
+extern const size_t %(sym)s_size;
+'''
+
+_h_binary_template = '''
+extern const unsigned char %(binary)s_start[];
+extern const unsigned char %(binary)s_end[];
+extern const unsigned char %(binary)s_size[];
+'''
+
+_incbin_template = '''/*
+ * Data of %(name)s. Automatically generated -- do not edit!
+ *
+ * Signature: %(sig)s
+ */
+
+\t.section .rodata
+\t.global %(sym)s
+\t.global %(sym)s_size
+\t.balign 8
+%(sym)s:
+\t.incbin "%(path)s"
+\t.size %(sym)s, . - %(sym)s
+\t.balign __SIZEOF_SIZE_T__
+%(sym)s_size:
+#if __SIZEOF_SIZE_T__ == 8
+\t.quad %(size)d
+#else
+\t.long %(size)d
+#endif
+\t.size %(sym)s_size, __SIZEOF_SIZE_T__
+'''
+
+_incbin_binary_template = '''\t.global %(binary)s_start
+\t.set %(binary)s_start, %(sym)s
+\t.global %(binary)s_end
+\t.set %(binary)s_end, %(sym)s + %(size)d
+\t.global %(binary)s_size
+\t.set %(binary)s_size, %(size)d
+'''
+
+
+def symbol(name):
+    '''Return the symbol of the data of a file. The symbol is the file's
+    name with the characters that cannot be in a C identifier replaced with
+    `_`, for example `fs-root.tar` is `fs_root_tar`.'''
+    sym = re.sub(r'[^A-Za-z0-9_]', '_', os.path.basename(name))
+    if len(sym) == 0 or sym[0].isdigit():
+        sym = '_' + sym
+    return sym
+
+
+def binary_symbol(path):
+    '''Return the prefix of the symbols `objcopy -I binary` defines for the
+    path, for example `fs/root.tar` is `_binary_fs_root_tar` and the symbols
+    are `_binary_fs_root_tar_start`, `_binary_fs_root_tar_end` and
+    `_binary_fs_root_tar_size`.'''
+    return '_binary_' + re.sub(r'[^A-Za-z0-9_]', '_', path)
+
+
+def bin2c_write(path, source, sym=None, binary=None):
+    '''Write a C file with the source file's data as an array of bytes and
+    the size of the data. The source file is memory mapped and converted in
+    chunks. If binary is the prefix of the `objcopy` symbols they are
+    defined.'''
+    if sym is None:
+        sym = symbol(source)
+    with open(source, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        with open(path, 'w') as out:
+            out.write(_c_template % {
+                'name': os.path.basename(source),
+                'sym': sym
+            })
+            if size == 0:
+                out.write('  0x00\n')
+            else:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    for offset in range(0, size, _bin2c_chunk):
+                        values = _hex_values(data[offset:offset +
+                                                  _bin2c_chunk])
+                        out.write('  ' + '\n  '.join([
+                            values[v:v + 80]
+                            for v in range(0, len(values), 80)
+                        ]) + '\n')
+                finally:
+                    data.close()
+            out.write('};\nconst size_t %s_size = %d;\n' % (sym, size))
+            if binary is not None:
+                out.write(_c_binary_template % {
+                    'binary': binary,
+                    'sym': sym,
+                    'size': size
+                })
+
+
+def bin2h_write(path, name, sym=None, binary=None):
+    '''Write a header declaring the data and size of a file.'''
+    if sym is None:
+        sym = symbol(name)
+    with open(path, 'w') as out:
+        out.write(_h_template % {
+            'name': os.path.basename(name),
+            'guard': sym.upper() + '_H',
+            'sym': sym
+        })
+        if binary is not None:
+            out.write(_h_binary_template % {'binary': binary})
+        out.write('\n#endif\n')
+
+
+def incbin_write(path, source, sym=None, sig=None, binary=None):
+    '''Write an assembler file that includes the source file's data with
+    `.incbin` so the data is not converted or parsed by the compiler. The
+    symbols are the same as the C file's. The assembler reads the source file
+    so the signature of the source file is written to the assembler file to
+    change it when the source file changes.'''
+    if sym is None:
+        sym = symbol(source)
+    if sig is None:
+        sig = _file_sha1(source)
+    size = os.stat(source).st_size
+    with open(path, 'w') as out:
+        out.write(_incbin_template % {
+            'name': os.path.basename(source),
+            'sig': sig,
+            'sym': sym,
+            'path': os.path.abspath(source).replace(os.sep, '/'),
+            'size': size
+        })
+        if binary is not None:
+            out.write(_incbin_binary_template % {
+                'binary': binary,
+                'sym': sym,
+                'size': size
+            })
+
+
+def _bin2c_task(task):
+    src = task.inputs[0]
+    sym = symbol(src.name)
+    binary = binary_symbol(src.path_from(task.generator.bld.bldnode))
+    if os.path.splitext(task.outputs[0].name)[1] == '.S':
+        incbin_write(task.outputs[0].abspath(), src.abspath(), sym,
+                     Utils.to_hex(src.get_bld_sig()), binary)
+    else:
+        bin2c_write(task.outputs[0].abspath(), src.abspath(), sym, binary)
+    bin2h_write(task.outputs[1].abspath(), src.name, sym, binary)
+
+
 def bin2c(ctx, name, target, source):
-    ctx(rule='${RTEMS_BIN2C} ${SRC} ${TGT}',
+    '''Add a task to convert the source file to the target C file and a
+    header. The header is the target with the `.h` extension. A target with
+    the `.S` extension is an assembler file that includes the source file's
+    data with `.incbin`.'''
+    if isinstance(target, str):
+        header = os.path.splitext(target)[0] + '.h'
+    else:
+        header = target.change_ext('.h')
+    ctx(rule=_bin2c_task,
         name=name,
-        target=target,
+        target=[target, header],
         source=source,
         color='PINK')
 
 
-def build(ctx, name, root, files):
+#
+# The compressions of an image and the extension of the compressed file. The
+# gzip compression is a single gzip stream made from chunks compressed in
+# parallel. The xz compression uses CRC32 checks as RTEMS's xz decompressor
+# may not support other checks.
+#
+compressions = {'gzip': '.gz', 'xz': '.xz'}
+levels = range(10)
+default_level = 6
+
+_gzip_chunk = 1024 * 1024
+_gzip_window = 32 * 1024
+
+
+def _deflate(data, level, dictionary, last):
+    '''Return the raw deflate data of a chunk. The chunk's compression is
+    primed with the end of the previous chunk and the data is flushed to a
+    byte boundary so the chunks can be joined.'''
+    if dictionary is None:
+        z = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    else:
+        z = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS,
+                             zdict=dictionary)
+    if last:
+        flush = zlib.Z_FINISH
+    else:
+        flush = zlib.Z_SYNC_FLUSH
+    return z.compress(data) + z.flush(flush)
+
+
+def _gzip(out, data, size, level, jobs):
+    chunks = [(offset, min(offset + _gzip_chunk, size))
+              for offset in range(0, size, _gzip_chunk)]
+    if len(chunks) == 0:
+        chunks = [(0, 0)]
+    if level == 9:
+        xfl = 2
+    elif level == 1:
+        xfl = 4
+    else:
+        xfl = 0
+    out.write(struct.pack('<BBBBIBB', 0x1f, 0x8b, 8, 0, 0, xfl, 255))
+    crc = 0
+    #
+    # The chunks are compressed in batches by the threads so only a batch of
+    # compressed chunks is held in memory.
+    #
+    batch = max(jobs, 1) * 4
+    for first in range(0, len(chunks), batch):
+        work = chunks[first:first + batch]
+        deflated = [None] * len(work)
+        lock = threading.Lock()
+        errors = []
+
+        def deflate(n):
+            start, end = work[n]
+            dictionary = None
+            if start != 0:
+                dictionary = data[max(start - _gzip_window, 0):start]
+            deflated[n] = _deflate(data[start:end], level, dictionary,
+                                   first + n == len(chunks) - 1)
+
+        def worker():
+            while True:
+                with lock:
+                    if len(errors) != 0 or len(pending) == 0:
+                        return
+                    n = pending.pop(0)
+                try:
+                    deflate(n)
+                except Exception as e:
+                    with lock:
+                        errors.append(e)
+
+        pending = list(range(len(work)))
+        threads = [
+            threading.Thread(target=worker)
+            for t in range(min(jobs, len(work)) - 1)
+        ]
+        for t in threads:
+            t.start()
+        worker()
+        for t in threads:
+            t.join()
+        if len(errors) != 0:
+            raise errors[0]
+        for n in range(len(work)):
+            start, end = work[n]
+            crc = zlib.crc32(data[start:end], crc)
+            out.write(deflated[n])
+    out.write(struct.pack('<II', crc & 0xffffffff, size & 0xffffffff))
+
+
+def _xz(out, data, size, level):
+    z = lzma.LZMACompressor(format=lzma.FORMAT_XZ,
+                            check=lzma.CHECK_CRC32,
+                            preset=level)
+    for offset in range(0, size, _gzip_chunk):
+        out.write(z.compress(data[offset:offset + _gzip_chunk]))
+    out.write(z.flush())
+
+
+def compress_write(path, source, method, level=None, jobs=1):
+    '''Write the compressed source file. The method is `gzip` or `xz` and
+    the level is the compression level from 0 to 9, the default is 6. The
+    gzip compression uses the number of jobs threads. Returns the size of
+    the compressed file.'''
+    if method not in compressions:
+        raise ValueError('rootfs compression not valid: %s' % (method))
+    if method == 'xz' and lzma is None:
+        raise ValueError('rootfs xz compression needs the lzma module')
+    if level is None:
+        level = default_level
+    if level not in levels:
+        raise ValueError('rootfs compression level not valid: %s' % (level))
+    with open(source, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        data = b''
+        if size != 0:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with open(path, 'wb') as out:
+                if method == 'gzip':
+                    _gzip(out, data, size, level, jobs)
+                else:
+                    _xz(out, data, size, level)
+        finally:
+            if size != 0:
+                data.close()
+    return os.stat(path).st_size
+
+
+def _compress_task(task):
+    src = task.inputs[0]
+    start = time.time()
+    size = compress_write(task.outputs[0].abspath(), src.abspath(),
+                          task.env.ROOTFS_COMPRESS,
+                          task.env.ROOTFS_COMPRESS_LEVEL,
+                          getattr(task.generator, 'rootfs_jobs', 1))
+    secs = time.time() - start
+    src_size = os.stat(src.abspath()).st_size
+    Logs.info('rootfs: %s: %d -> %d bytes (%.1f%%) in %.3f secs' %
+              (task.outputs[0].name, src_size, size,
+               size * 100.0 / max(src_size, 1), secs))
+
+
+@TaskGen.feature('rootfs_compress')
+@TaskGen.before_method('process_rule')
+def rootfs_compress_env(self):
+    self.env.ROOTFS_COMPRESS = self.rootfs_compress
+    level = getattr(self, 'rootfs_level', None)
+    if level is None:
+        level = default_level
+    self.env.ROOTFS_COMPRESS_LEVEL = level
+
+
+def compress_file(ctx,
+                  name,
+                  target,
+                  source,
+                  method,
+                  level=None,
+                  jobs=None):
+    '''Add a task to compress the source file. The method is a key of
+    `compressions` and the level is from 0 to 9. The task is one build job
+    so the gzip compression uses a single thread unless jobs is given or the
+    `--rtems-rootfs-jobs` option is set. The compressed file does not depend
+    on the number of jobs.'''
+    if method not in compressions:
+        ctx.fatal('rootfs compression not valid: %s' % (method))
+    if method == 'xz' and lzma is None:
+        ctx.fatal('rootfs xz compression needs the Python lzma module')
+    if level is not None and level not in levels:
+        ctx.fatal('rootfs compression level not valid (0 to 9): %s' % (level))
+    if jobs is None:
+        jobs = getattr(Options.options, 'rtems_rootfs_jobs', None) or 1
+    try:
+        threads = int(jobs)
+    except ValueError:
+        threads = 0
+    if threads < 1:
+        ctx.fatal('rootfs compression jobs not valid: %s' % (jobs))
+    return ctx(features='rootfs_compress',
+               rule=_compress_task,
+               name=name,
+               target=target,
+               source=source,
+               rootfs_compress=method,
+               rootfs_level=level,
+               rootfs_jobs=threads,
+               vars=['ROOTFS_COMPRESS', 'ROOTFS_COMPRESS_LEVEL'],
+               color='CYAN')
+
+
+#
+# The routes to embed data in an object. The `incbin` route assembles a file
+# that includes the data and the `c` route compiles the data converted to C.
+#
+routes = ['incbin', 'c']
+
+
+def embed(ctx, name, source, obj=None, route=None):
+    '''Add tasks to embed the data of the source file in an object.
+
+    The data is the array `<sym>` and its size is `<sym>_size` where the
+    symbol is the source file's name, for example `fs_root_tar` for
+    `fs-root.tar`. The symbols `objcopy -I binary` defines for the source
+    file's path in the build directory are also defined, for example
+    `_binary_fs_root_tar_start`, `_binary_fs_root_tar_end` and
+    `_binary_fs_root_tar_size`. A header declaring the symbols is written
+    next to the source file, for example `fs-root-tar.h`.
+
+    The route is `incbin` or `c`. The default is `incbin` if there is an
+    assembler as it only runs the assembler and the data is not copied. If
+    obj is a file name the object is built as that file else the object is
+    built by an objects task generator called name.
+    '''
+    if route is None:
+        if ctx.env.AS:
+            route = 'incbin'
+        else:
+            route = 'c'
+    if route not in routes:
+        ctx.fatal('rootfs embed route not valid: %s' % (route))
+    if isinstance(source, str):
+        parent = ctx.path
+        path, stub = os.path.split(source)
+    else:
+        parent = source.parent
+        path, stub = '', source.name
+    if '.' in stub:
+        stub = stub.replace('.', '-')
+    else:
+        stub += '-bin'
+    stub = os.path.join(path, stub)
+    if route == 'incbin':
+        features = 'asm'
+        stub += '.S'
+        rule = '${AS} ${ASFLAGS} -c ${SRC} -o ${TGT}'
+    else:
+        features = 'c'
+        stub += '.c'
+        rule = '${CC} ${CFLAGS} -c ${SRC} -o ${TGT}'
+    stub = parent.find_or_declare(stub)
+    bin2c(ctx, name=name + '-' + route, target=stub, source=source)
+    if obj is None:
+        ctx.objects(features=features, target=name, source=stub)
+    else:
+        ctx(rule=rule, name=name, target=obj, source=stub)
+
+
+def build(ctx,
+          name,
+          root,
+          files,
+          route=None,
+          compress=None,
+          level=None,
+          jobs=None):
     """The files are truples of the name, source and target files to put in the tar
        file. The truple is (name, src, dst). The src is the absolute path to the
        source and the dst is the path on the target.
 
-       The tar file will contain the files defined by the dst paths. These are
-       copied into the build path under the tar file's root path. Make sure the
-       desination paths are relative to the root of the tar file.
+       The tar file will contain the files defined by the dst paths. The source
+       files are written to the tar file directly under the dst paths. Make sure
+       the desination paths are relative to the root of the tar file.
 
        For example:
           import rtems_waf.rootfs as rtems_rootfs
           tar_files = [('shell-init', ''shell-init', 'shell-init'),
                        ('rc-conf', 'rc.conf', 'etc/rc.conf')]
           rtems_rootfs.build(ctx, 'fs-root', 'rootfs', tar_files)
+
+       The tar file is embedded in the objects `fs-root-obj` as the array
+       `fs_root_tar` with the size `fs_root_tar_size`. The header
+       `fs-root-tar.h` declares them. The route is passed to `embed`.
+
+       If compress is `gzip` or `xz` the tar file is compressed at the level
+       and the compressed file is embedded, for example `fs_root_tar_gz`. The
+       gzip compression uses jobs threads, see `compress_file`.
     """
     #
     # The files must be a list of tuples.
@@ -82,8 +838,7 @@ def build(ctx, name, root, files):
     if not isinstance(files, list):
         ctx.fatal('rootfs build files is not a list')
 
-    root_abspath = join(ctx.path.get_bld().abspath(), root)
-
+    sources = []
     for f in files:
         #
         # Check each item in the list is a tuple with 3 elements.
@@ -94,51 +849,61 @@ def build(ctx, name, root, files):
             ctx.fatal(
                 'rootfs build file tuple has 3 items (name, src, dst): %s' %
                 (str(f)))
-        #
-        # Copy the file as a build task. The file is copied to the tar file's
-        # root.
-        #
-        #print(']]', ctx.path.make_node(join(root, f[2])).get_bld())
         if isinstance(f[1], str):
             source = ctx.path.make_node(f[1]).get_src()
         else:
             source = f[1]
-        copy(ctx,
-             name=f[0],
-             root=root,
-             target=ctx.path.make_node(join(root, f[2])).get_bld(),
-             source=source)
-
-    ctx.add_group()
+        sources += [source]
 
     #
-    # Tar build task.
+    # Tar build task. The source files are streamed into the tar file under
+    # their target paths so there are no copies in the build directory. The
+    # tasks are ordered by the nodes they make and use so there are no build
+    # groups and the images are built with the rest of the build.
     #
-    tar(ctx,
-        name=name + '-tar',
-        root=join(ctx.path.get_bld(), root),
-        target=name + '.tar',
-        source=[join(root, f[2]) for f in files],
-        depends_on=[f[0] for f in files])
-
-    ctx.add_group()
+    tar = ctx.path.find_or_declare(name + '.tar')
+    tar_file(ctx,
+             name=name + '-tar',
+             target=tar,
+             source=sources,
+             members=[str(f[2]) for f in files])
 
     #
-    # Binary to C build task. It converts the tar file to a C file. This uses
-    # the RTEMS Tools Project's `bin2c` command.
+    # Compress the tar file.
     #
-    bin2c(ctx, name=name, target=name + '-tar.c', source=name + '.tar')
+    image = tar
+    if compress is not None:
+        image = ctx.path.find_or_declare(name + '.tar' +
+                                         compressions[compress])
+        compress_file(ctx,
+                      name=name + '-' + compress,
+                      target=image,
+                      source=tar,
+                      method=compress,
+                      level=level,
+                      jobs=jobs)
 
-    ctx.add_group()
-
-    ctx.objects(features='c', target=name + '-obj', source=name + '-tar.c')
+    #
+    # Embed the image in an object.
+    #
+    embed(ctx, name=name + '-obj', source=image, route=route)
 
 
-def build_from_src_root(ctx, name, root):
+def build_from_src_root(ctx,
+                        name,
+                        root,
+                        route=None,
+                        compress=None,
+                        level=None,
+                        jobs=None):
     root_path = ctx.path.make_node(root)
     if not root_path.exists():
         ctx.fatal('tar root not found: %s' % (root_path))
     sources = [s.path_from(root_path) for s in root_path.ant_glob('**')]
     build(ctx, name, root,
           [('%s-%s' % (name, os.path.basename(s)), join(root, s), s)
-           for s in sources])
+           for s in sources],
+          route=route,
+          compress=compress,
+          level=level,
+          jobs=jobs)
@@ -28,9 +28,16 @@ from __future__ import print_function
 #
 
 import copy
+import logging
 import os
 import os.path
+from . import confcache
+from . import deps
+from . import explain
 from . import pkgconfig
+from . import rootfs
+from . import timing
+from . import toolchain
 import re
 import subprocess
 import sys
@@ -39,6 +46,11 @@ rtems_default_version = None
 rtems_filters = None
 rtems_long_commands = False
 
+rtems_cpuopts = [
+    'RTEMS_DEBUG', 'RTEMS_MULTIPROCESSING', 'RTEMS_NEWLIB', 'RTEMS_POSIX_API',
+    'RTEMS_SMP', 'RTEMS_NETWORKING'
+]
+
 windows = os.name == 'nt' or sys.platform in ['msys', 'cygwin']
 
 
@@ -66,11 +78,44 @@ def options(opt):
                      default='all',
                      dest='rtems_bsps',
                      help='List of BSPs to build.')
+    copts.add_option('--rtems-configure-jobs',
+                     default=None,
+                     dest='rtems_configure_jobs',
+                     help='Number of BSPs to configure in parallel (default 1).')
+    copts.add_option('--rtems-no-configure-cache',
+                     action='store_true',
+                     default=False,
+                     dest='rtems_no_configure_cache',
+                     help='Do not use the cached BSP configure results.')
+    copts.add_option(
+        '--rtems-configure-cache-reset',
+        default=None,
+        dest='rtems_configure_cache_reset',
+        help='Reset the cached configure results of the BSPs (default none).')
+    copts.add_option('--rtems-configure-timing',
+                     action='store_true',
+                     default=False,
+                     dest='rtems_configure_timing',
+                     help='Print the time the configure phases take.')
+    copts.add_option(
+        '--rtems-install-fingerprint',
+        action='store_true',
+        default=False,
+        dest='rtems_install_fingerprint',
+        help='Track the installed RTEMS and tools headers by a fingerprint.')
+    copts.add_option('--rtems-deferred-deps',
+                     action='store_true',
+                     default=False,
+                     dest='rtems_deferred_deps',
+                     help='Read the compiler dependency files in the background.')
     copts.add_option('--show-commands',
                      action='store_true',
                      default=False,
                      dest='show_commands',
                      help='Print the commands as strings.')
+    deps.options(opt)
+    explain.options(opt)
+    rootfs.options(opt)
 
 
 def init(ctx, filters=None, version=None, long_commands=False, bsp_init=None):
@@ -106,16 +151,19 @@ def init(ctx, filters=None, version=None, long_commands=False, bsp_init=None):
         env.load(waflib.Options.lockfile)
 
         #
-        # Check the tools, architectures and bsps.
+        # Use the arch/bsps configure resolved if the install has not
+        # changed else check the tools, architectures and bsps.
         #
-        rtems_version, rtems_path, rtems_tools, archs, arch_bsps = \
-            check_options(ctx,
-                          env.options['prefix'],
-                          env.options['rtems_tools'],
-                          env.options['rtems_path'],
-                          env.options['rtems_version'],
-                          env.options['rtems_archs'],
-                          env.options['rtems_bsps'])
+        arch_bsps = _configured_arch_bsps(env)
+        if arch_bsps is None:
+            rtems_version, rtems_path, rtems_tools, archs, arch_bsps = \
+                check_options(ctx,
+                              env.options['prefix'],
+                              env.options['rtems_tools'],
+                              env.options['rtems_path'],
+                              env.options['rtems_version'],
+                              env.options['rtems_archs'],
+                              env.options['rtems_bsps'])
 
         #
         # Update the contexts for all the bsps.
@@ -124,8 +172,8 @@ def init(ctx, filters=None, version=None, long_commands=False, bsp_init=None):
             InstallContext, UninstallContext
         for x in arch_bsps:
             for y in (BuildContext, CleanContext, InstallContext,
-                      UninstallContext):
-                name = y.__name__.replace('Context', '').lower()
+                      UninstallContext, deps.deps_context):
+                name = y.cmd
 
                 class context(y):
                     cmd = name + '-' + x
@@ -138,7 +186,7 @@ def init(ctx, filters=None, version=None, long_commands=False, bsp_init=None):
         #
         commands = []
         for cmd in waflib.Options.commands:
-            if cmd in ['build', 'clean', 'install', 'uninstall']:
+            if cmd in ['build', 'clean', 'install', 'uninstall', 'deps']:
                 for x in arch_bsps:
                     commands += [cmd + '-' + x]
             else:
@@ -151,6 +199,57 @@ def init(ctx, filters=None, version=None, long_commands=False, bsp_init=None):
         bsp_init(ctx, env, contexts)
 
 
+def _install_fingerprint(options):
+    """Return a fingerprint of the options and the install that determine the
+    arch/bsps. The install is checked by the modified times of the paths that
+    change if tools or BSPs are installed or removed. The fingerprint is cheap
+    to create so init can check the stored arch/bsps are valid."""
+    prefix = options.get('prefix')
+    rtems_path = options.get('rtems_path')
+    rtems_tools = options.get('rtems_tools')
+    if rtems_path is None:
+        rtems_path = prefix
+    if rtems_tools is None:
+        rtems_tools = rtems_path
+    stamps = []
+    if rtems_path is not None:
+        stamps += [
+            confcache.file_stamp(rtems_path),
+            confcache.file_stamp(_pkgconfig_path(rtems_path)),
+            confcache.file_stamp(os.path.join(rtems_path, 'rtems-config'))
+        ]
+    if rtems_tools is not None:
+        stamps += [
+            confcache.file_stamp(os.path.join(path, 'bin'))
+            for path in rtems_tools.split(',')
+        ]
+    return confcache.fingerprint([
+        options.get(o) for o in [
+            'prefix', 'rtems_tools', 'rtems_path', 'rtems_version',
+            'rtems_archs', 'rtems_bsps'
+        ]
+    ], rtems_default_version, repr(rtems_filters), stamps)
+
+
+def _configured_arch_bsps(lock_env):
+    """Return the arch/bsps from the stored configuration if the install has
+    not changed since configure else None."""
+    import waflib.Build
+    import waflib.ConfigSet
+    env = waflib.ConfigSet.ConfigSet()
+    try:
+        env.load(
+            os.path.join(lock_env.out_dir, waflib.Build.CACHE_DIR,
+                         waflib.Build.CACHE_SUFFIX))
+    except Exception:
+        return None
+    if not env.RTEMS_INSTALL_FINGERPRINT or not env.ARCH_BSPS:
+        return None
+    if env.RTEMS_INSTALL_FINGERPRINT != _install_fingerprint(lock_env.options):
+        return None
+    return env.ARCH_BSPS
+
+
 def test_application(more=[]):
     code = ['#include <rtems.h>']
     code += more
@@ -187,14 +286,20 @@ def configure(conf, bsp_configure=None):
     else:
         long_commands = 'no'
 
-    rtems_version, rtems_path, rtems_tools, archs, arch_bsps = \
-        check_options(conf,
-                      conf.options.prefix,
-                      conf.options.rtems_tools,
-                      conf.options.rtems_path,
-                      conf.options.rtems_version,
-                      conf.options.rtems_archs,
-                      conf.options.rtems_bsps)
+    jobs = _configure_jobs(conf)
+
+    timer = timing.timer()
+    conf.rtems_timer = timer
+
+    with timer.phase('check options'):
+        rtems_version, rtems_path, rtems_tools, archs, arch_bsps = \
+            check_options(conf,
+                          conf.options.prefix,
+                          conf.options.rtems_tools,
+                          conf.options.rtems_path,
+                          conf.options.rtems_version,
+                          conf.options.rtems_archs,
+                          conf.options.rtems_bsps)
 
     if rtems_tools is None:
         conf.fatal('RTEMS tools not found.')
@@ -208,109 +313,466 @@ def configure(conf, bsp_configure=None):
     env = conf.env.derive()
     conf.env.RTEMS_ARCH_BSP_LIST = arch_bsps
 
-    for ab in arch_bsps:
-        conf.setenv(ab, env)
-
-        conf.msg('Board Support Package (BSP)', ab, 'YELLOW')
+    cache = _configure_cache(conf)
+    with timer.phase('tool index'):
+        tool_index = toolchain.index(rtems_tools, cache)
 
+    if jobs > 1 and len(arch_bsps) > 1:
         #
-        # Show and long commands support.
+        # Set up all the BSP environments then run the BSP probes not found
+        # in the cache in parallel. The probe results and logs are reported
+        # in BSP order once all the probes have finished.
         #
-        conf.env.SHOW_COMMANDS = show_commands
-        conf.env.LONG_COMMANDS = long_commands
+        conf.msg('Configure jobs', str(jobs), 'YELLOW')
+        probes = {}
+        for ab in arch_bsps:
+            tools = _configure_bsp_env(conf, env, ab, rtems_version,
+                                       rtems_path, tool_index, cache, tools,
+                                       show_commands, long_commands)
+            fp = _probes_fingerprint(conf, rtems_path)
+            probes[ab] = (fp, cache.get('probes', arch_bsp_name(ab), fp))
+            conf.setenv('', env)
+        results = _configure_bsp_probes_parallel(
+            conf, [ab for ab in arch_bsps if probes[ab][1] is None], jobs)
+        for ab in arch_bsps:
+            conf.setenv(ab)
+            conf.msg('Board Support Package (BSP)', ab, 'YELLOW')
+            fp, result = probes[ab]
+            if result is not None:
+                _configure_bsp_cached_probes(conf, result)
+            else:
+                logger, msgs, error = results[ab]
+                logger.records.replay(conf.logger)
+                for msg, res, color in msgs:
+                    if color is None:
+                        conf.msg(msg, res)
+                    else:
+                        conf.msg(msg, res, color=color)
+                if error is not None:
+                    conf.fatal('%s: %s' % (ab, error))
+                cache.set('probes', arch_bsp_name(ab), fp,
+                          _probes_result(conf))
+            _configure_bsp_hooks(conf, ab, bsp_configure)
+            conf.setenv('', env)
+    else:
+        for ab in arch_bsps:
+            conf.msg('Board Support Package (BSP)', ab, 'YELLOW')
+            tools = _configure_bsp_env(conf, env, ab, rtems_version,
+                                       rtems_path, tool_index, cache, tools,
+                                       show_commands, long_commands)
+            fp = _probes_fingerprint(conf, rtems_path)
+            result = cache.get('probes', arch_bsp_name(ab), fp)
+            if result is not None:
+                _configure_bsp_cached_probes(conf, result)
+            else:
+                _configure_bsp_probes(conf)
+                cache.set('probes', arch_bsp_name(ab), fp,
+                          _probes_result(conf))
+            _configure_bsp_hooks(conf, ab, bsp_configure)
+            conf.setenv('', env)
+
+    cache.report(conf, 'tools')
+    cache.report(conf, 'compilers')
+    cache.report(conf, 'waf-tools')
+    cache.report(conf, 'probes')
+    cache.store()
+
+    _configure_timing(conf, timer)
+
+    conf.env.RTEMS_TOOLS = rtems_tools
+    conf.env.ARCHS = archs
+    conf.env.ARCH_BSPS = arch_bsps
+    conf.env.RTEMS_INSTALL_FINGERPRINT = _install_fingerprint(
+        conf.options.__dict__)
+
+    conf.env.SHOW_COMMANDS = show_commands
+    conf.env.LONG_COMMANDS = long_commands
+
+
+def _configure_timing(conf, timer):
+    """Write the configure timing report and log the summary."""
+    report = timer.write(
+        os.path.join(conf.bldnode.abspath(), timing.report_file))
+    _log_header(conf)
+    for l in timer.summary(report):
+        conf.to_log(l)
+    if conf.options.rtems_configure_timing:
+        for phase, t in sorted(report['phases'].items(),
+                               key=lambda p: p[1]['total'],
+                               reverse=True):
+            conf.msg('Configure time (%s)' % (phase),
+                     '%.3f secs' % (t['total']))
+        conf.msg('Configure time', '%.3f secs' % (report['total']), 'YELLOW')
+
+
+def _configure_jobs(conf):
+    jobs = conf.options.rtems_configure_jobs
+    if jobs is None:
+        return 1
+    try:
+        jobs = int(jobs)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        conf.fatal('Invalid RTEMS configure jobs: %s' %
+                   (conf.options.rtems_configure_jobs))
+    return jobs
+
 
-        conf.msg('Show commands', show_commands)
-        conf.msg('Long commands', long_commands)
+def _configure_bsp_env(conf, env, ab, rtems_version, rtems_path, tool_index,
+                       cache, tools, show_commands, long_commands):
+    """Create the BSP's environment, find the tools and load the flags."""
+    conf.setenv(ab, env)
 
-        arch = _arch_from_arch_bsp(ab)
-        bsp = _bsp_from_arch_bsp(ab)
+    #
+    # Show and long commands support.
+    #
+    conf.env.SHOW_COMMANDS = show_commands
+    conf.env.LONG_COMMANDS = long_commands
+
+    conf.msg('Show commands', show_commands)
+    conf.msg('Long commands', long_commands)
+
+    arch = _arch_from_arch_bsp(ab)
+    bsp = _bsp_from_arch_bsp(ab)
 
-        conf.env.ARCH_BSP = '%s/%s' % (arch.split('-')[0], bsp)
+    conf.env.ARCH_BSP = '%s/%s' % (arch.split('-')[0], bsp)
 
-        conf.env.RTEMS_PATH = rtems_path
-        conf.env.RTEMS_VERSION = rtems_version
-        conf.env.RTEMS_ARCH_BSP = ab
-        conf.env.RTEMS_ARCH = arch.split('-')[0]
-        conf.env.RTEMS_ARCH_RTEMS = arch
-        conf.env.RTEMS_BSP = bsp
+    conf.env.RTEMS_PATH = rtems_path
+    conf.env.RTEMS_VERSION = rtems_version
+    conf.env.RTEMS_ARCH_BSP = ab
+    conf.env.RTEMS_ARCH = arch.split('-')[0]
+    conf.env.RTEMS_ARCH_RTEMS = arch
+    conf.env.RTEMS_BSP = bsp
 
-        tools = _find_tools(conf, arch, rtems_tools, tools)
-        for t in tools[arch]:
-            conf.env[t] = tools[arch][t]
+    with timing.phase(conf, 'find tools'):
+        tools = _find_tools(conf, arch, tool_index, tools)
+    for t in tools[arch]:
+        conf.env[t] = tools[arch][t]
+
+    with timing.phase(conf, 'load waf tools'):
+        _load_waf_tools(conf, ab, cache)
+    if conf.options.rtems_deferred_deps:
+        conf.env.GCCDEPS_DEFERRED = True
+
+    #
+    # Get the version of the tools being used. A compiler is probed once.
+    #
+    rtems_cc = conf.env.CC[0]
+    try:
+        with timing.phase(conf, 'compiler version'):
+            cc = toolchain.identify(conf, rtems_cc, cache)
+    except Exception as e:
+        conf.fatal('CC version not found: %s' % (e))
+    conf.msg('Compiler version (%s)' % (os.path.basename(rtems_cc)),
+             cc.version)
+
+    with timing.phase(conf, 'load flags'):
+        flags = _load_flags(conf, ab, rtems_path, cache)
+
+    cflags = _filter_flags('cflags', flags['CFLAGS'], arch, rtems_path)
+    ldflags = _filter_flags('ldflags', flags['LDFLAGS'], arch, rtems_path)
+
+    cflags['cxxflags'] = copy.copy(cflags['cflags'])
+    cflags['asflags'] = copy.copy(cflags['cflags'])
+
+    conf.env.CFLAGS = cflags['cflags']
+    conf.env.CXXFLAGS = cflags['cxxflags']
+    conf.env.ASFLAGS = cflags['asflags']
+    conf.env.WFLAGS = cflags['warnings']
+    conf.env.RFLAGS = cflags['specs']
+    conf.env.MFLAGS = cflags['machines']
+    conf.env.IFLAGS = _filter_inc_opts(cflags['includes'], '-I')
+    conf.env.ISYSTEM = _filter_inc_opts(cflags['includes'], '-isystem')
+    conf.env.ISYSROOT = _filter_inc_opts(cflags['includes'], '-sysroot')
+    conf.env.LINKFLAGS = cflags['cflags'] + ldflags['ldflags']
+    conf.env.LIB = flags['LIB']
+    conf.env.LIBPATH = ldflags['libpath']
+
+    conf.env.RTRACE_WRAPPER_ST = '-W %s'
+
+    if conf.options.rtems_install_fingerprint:
+        _install_fingerprint_deps(conf, rtems_path, tool_index)
+
+    return tools
+
+
+#
+# The variables Waf's compiler version check sets.
+#
+_cc_version_vars = ['CC_VERSION', 'DEST_OS', 'DEST_BINFMT', 'DEST_CPU']
+
+
+def _load_waf_tools(conf, ab, cache):
+    """Load the Waf compiler tools. The compiler version checks and the
+    gccdeps flags checks run the compilers so their results are held in the
+    configure cache keyed on the BSP and the compilers. The tools are always
+    loaded so the build sees them."""
+    key = arch_bsp_name(ab)
+    stamps = [
+        confcache.file_stamp(Utils.to_list(conf.env[tool])[0])
+        for tool in ['CC', 'CXX', 'AS'] if conf.env[tool]
+    ]
+    stamps += [
+        confcache.file_stamp(os.path.join(os.path.dirname(__file__),
+                                          'gccdeps.py'))
+    ]
+    flags = [
+        os.environ.get(f)
+        for f in ['CFLAGS', 'CXXFLAGS', 'CPPFLAGS', 'LINKFLAGS', 'LDFLAGS']
+    ]
+    fp = confcache.fingerprint(stamps, flags, conf.env.GCCDEPS_FLAGS,
+                               getattr(conf.options, 'enable_gccdeps', True))
+    result = cache.get('waf-tools', key, fp)
+    if result is None:
+        versions = {}
+    else:
+        versions = result['versions']
+        conf.env.GCCDEPS_CHECKS = dict(result['gccdeps'])
 
+    get_cc_version = conf.get_cc_version
+
+    def cc_version(cc, **kw):
+        cmd = ' '.join(Utils.to_list(cc))
+        if cmd not in versions:
+            get_cc_version(cc, **kw)
+            versions[cmd] = dict([(var, conf.env[var])
+                                  for var in _cc_version_vars])
+        for var in _cc_version_vars:
+            conf.env[var] = versions[cmd][var]
+
+    conf.get_cc_version = cc_version
+    try:
         conf.load('gcc')
         conf.load('g++')
         conf.load('gas')
         conf.load('gccdeps', tooldir=os.path.dirname(__file__))
+    finally:
+        del conf.get_cc_version
+
+    if result is None:
+        cache.set('waf-tools', key, fp, {
+            'versions': versions,
+            'gccdeps': dict(conf.env.GCCDEPS_CHECKS or {})
+        })
+
+
+def _bsp_stamp_files(conf, rtems_path):
+    """Return the installed files the BSP's configuration depends on. The
+    include paths are searched the way the compiler and `load_cpuopts` search
+    them."""
+    files = [
+        os.path.join(_pkgconfig_path(rtems_path),
+                     conf.env.RTEMS_ARCH_BSP + '.pc'),
+        os.path.join(rtems_path, 'rtems-config'), conf.env.CC[0]
+    ]
+    for inc in conf.env.IFLAGS + conf.env.ISYSTEM:
+        files += [
+            inc,
+            os.path.join(inc, 'bspopts.h'),
+            os.path.join(inc, 'rtems', 'score', 'cpuopts.h')
+        ]
+    return files
+
+
+def _install_fingerprint_deps(conf, rtems_path, tool_index):
+    """Track the headers under the RTEMS path and the tools by a fingerprint
+    of the BSP's installed files and the headers in the BSP's include paths.
+    The headers are not hashed when building, a header is seen as changed if
+    its modified time or size changes. A change to the tools' headers is only
+    seen if the tools are installed again."""
+    conf.env.GCCDEPS_IMMUTABLE = [rtems_path] + \
+        [os.path.dirname(path) for path in tool_index.paths]
+    conf.env.GCCDEPS_IMMUTABLE_STAMPS = _bsp_stamp_files(conf, rtems_path)
+    #
+    # The headers in the include paths under the RTEMS path are stamped so a
+    # header installed in place, for example by a package installed in the
+    # same prefix, is seen.
+    #
+    prefix = os.path.normpath(rtems_path) + os.sep
+    conf.env.GCCDEPS_IMMUTABLE_TREES = [
+        inc for inc in conf.env.IFLAGS + conf.env.ISYSTEM
+        if os.path.normpath(inc).startswith(prefix)
+    ]
+    conf.msg('Install fingerprint dependencies', 'yes')
 
-        #
-        # Get the version of the tools being used.
-        #
-        rtems_cc = conf.env.CC[0]
-        try:
-            import waflib.Context
-            out = conf.cmd_and_log([rtems_cc, '--version'],
-                                   output=waflib.Context.STDOUT)
-        except Exception as e:
-            conf.fatal('CC version not found: %s' % (e.stderr))
-        #
-        # First line is the version
-        #
-        vline = out.split('\n')[0]
-        conf.msg('Compiler version (%s)' % (os.path.basename(rtems_cc)),
-                 ' '.join(vline.split()[2:]))
 
-        flags = _load_flags(conf, ab, rtems_path)
+def _configure_bsp_probes(ctx):
+    """Run the compiler probes for the BSP in the context's environment.
 
-        cflags = _filter_flags('cflags', flags['CFLAGS'], arch, rtems_path)
-        ldflags = _filter_flags('ldflags', flags['LDFLAGS'], arch, rtems_path)
+    The context is the configure context or, when configuring in parallel, a
+    build context with a private logger. The probes only use the context's
+    environment.
+    """
+    #
+    # Checks for various RTEMS features.
+    #
+    with timing.phase(ctx, 'check bsp'):
+        ctx.check_cc(fragment=test_application(),
+                     execute=False,
+                     msg='Checking for a valid RTEMS BSP installation',
+                     rtems_arch_bsp=ctx.env.RTEMS_ARCH_BSP)
+    with timing.phase(ctx, 'load cpuopts'):
+        load_cpuopts(ctx)
+
+
+def _probes_fingerprint(conf, rtems_path):
+    """Return a fingerprint of what the BSP probe results depend on."""
+    pc = os.path.join(_pkgconfig_path(rtems_path),
+                      conf.env.RTEMS_ARCH_BSP + '.pc')
+    stamps = [
+        confcache.file_stamp(path)
+        for path in _bsp_stamp_files(conf, rtems_path)
+    ]
+    return confcache.fingerprint(stamps, confcache.file_contents(pc),
+                                 conf.env.CFLAGS, conf.env.LINKFLAGS,
+                                 conf.env.LIB, test_application(),
+                                 rtems_cpuopts)
 
-        cflags['cxxflags'] = copy.copy(cflags['cflags'])
-        cflags['asflags'] = copy.copy(cflags['cflags'])
 
-        conf.env.CFLAGS = cflags['cflags']
-        conf.env.CXXFLAGS = cflags['cxxflags']
-        conf.env.ASFLAGS = cflags['asflags']
-        conf.env.WFLAGS = cflags['warnings']
-        conf.env.RFLAGS = cflags['specs']
-        conf.env.MFLAGS = cflags['machines']
-        conf.env.IFLAGS = _filter_inc_opts(cflags['includes'], '-I')
-        conf.env.ISYSTEM = _filter_inc_opts(cflags['includes'], '-isystem')
-        conf.env.ISYSROOT = _filter_inc_opts(cflags['includes'], '-sysroot')
-        conf.env.LINKFLAGS = cflags['cflags'] + ldflags['ldflags']
-        conf.env.LIB = flags['LIB']
-        conf.env.LIBPATH = ldflags['libpath']
+def _probes_result(conf):
+    return {
+        'cpuopts': dict([(opt, conf.env[opt]) for opt in rtems_cpuopts])
+    }
 
-        conf.env.RTRACE_WRAPPER_ST = '-W %s'
 
-        #
-        # Checks for various RTEMS features.
-        #
-        conf.check_cc(fragment=test_application(),
-                      execute=False,
-                      msg='Checking for a valid RTEMS BSP installation')
-        load_cpuopts(conf)
+def _configure_bsp_cached_probes(conf, result):
+    conf.msg('Checking for a valid RTEMS BSP installation', 'yes (cached)')
+    for opt in rtems_cpuopts:
+        conf.env[opt] = result['cpuopts'][opt]
+        if conf.env[opt] == 'Yes':
+            conf.msg('Checking for %s' % (opt), 'yes (cached)')
+        else:
+            conf.msg('Checking for %s' % (opt), False)
 
-        #
-        # Add tweaks.
-        #
+
+def _configure_cache(conf):
+    cache = confcache.cache(os.path.join(conf.cachedir.abspath(),
+                                         confcache.cache_file),
+                            enabled=not conf.options.rtems_no_configure_cache)
+    reset = conf.options.rtems_configure_cache_reset
+    if reset is not None:
+        if reset == 'all':
+            cache.invalidate()
+        else:
+            for ab in reset.split(','):
+                if len(ab.split('/')) != 2:
+                    conf.fatal('Invalid configure cache reset BSP: %s' % (ab))
+                cache.invalidate(ab)
+    return cache
+
+
+def _configure_bsp_hooks(conf, ab, bsp_configure):
+    #
+    # Add tweaks.
+    #
+    with timing.phase(conf, 'tweaks'):
         tweaks(conf, ab)
 
-        #
-        # If the user has supplied a BSP specific configure function
-        # call it.
-        #
-        if bsp_configure:
+    #
+    # If the user has supplied a BSP specific configure function
+    # call it.
+    #
+    if bsp_configure:
+        with timing.phase(conf, 'bsp_configure'):
             bsp_configure(conf, ab)
 
-        conf.setenv('', env)
 
-    conf.env.RTEMS_TOOLS = rtems_tools
-    conf.env.ARCHS = archs
-    conf.env.ARCH_BSPS = arch_bsps
+class _bsp_log_records(logging.Handler):
+    """Hold a BSP's log records so they can be replayed in BSP order."""
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def replay(self, logger):
+        for record in self.records:
+            logger.handle(record)
+        self.records = []
+
+
+def _bsp_logger(name):
+    """Return a private logger that holds the records in memory. The logger
+    is not registered with the logging module so it is not shared between
+    configures and its records are only written when replayed."""
+    logger = logging.Logger(name, logging.DEBUG)
+    logger.propagate = False
+    logger.records = _bsp_log_records()
+    logger.addHandler(logger.records)
+    return logger
+
+
+def _configure_bsp_job(conf, ab):
+    """Probe a BSP in a worker thread.
+
+    A build context is used so the probes do not touch the configure context's
+    state. The log is held in memory and the messages are captured so they can
+    be reported in BSP order by the configure context.
+    """
+    import waflib.Build
+    bld = waflib.Build.BuildContext(top_dir=conf.srcnode.abspath(),
+                                    out_dir=conf.bldnode.abspath())
+    bld.init_dirs()
+    bld.env = conf.all_envs[ab]
+    bld.rtems_timer = getattr(conf, 'rtems_timer', None)
+    bld.logger = _bsp_logger('rtems-configure-' + ab)
+    msgs = []
+
+    def start_msg(*k, **kw):
+        if not kw.get('quiet'):
+            msgs.append([kw.get('msg') or k[0], None, None])
+
+    def end_msg(*k, **kw):
+        if not kw.get('quiet'):
+            color = kw.get('color')
+            if color is None and len(k) > 1:
+                color = k[1]
+            for m in reversed(msgs):
+                if m[1] is None:
+                    m[1] = k[0]
+                    m[2] = color
+                    break
+
+    bld.start_msg = start_msg
+    bld.end_msg = end_msg
+    error = None
+    try:
+        _configure_bsp_probes(bld)
+    except Exception as e:
+        error = e
+    return bld.logger, msgs, error
 
-    conf.env.SHOW_COMMANDS = show_commands
-    conf.env.LONG_COMMANDS = long_commands
+
+def _configure_bsp_probes_parallel(conf, arch_bsps, jobs):
+    import threading
+    try:
+        import queue
+    except ImportError:
+        import Queue as queue
+    work = queue.Queue()
+    for ab in arch_bsps:
+        work.put(ab)
+    results = {}
+
+    def worker():
+        while True:
+            try:
+                ab = work.get_nowait()
+            except queue.Empty:
+                return
+            results[ab] = _configure_bsp_job(conf, ab)
+
+    threads = [
+        threading.Thread(target=worker)
+        for j in range(min(jobs, len(arch_bsps)))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
 
 
 def build(bld):
@@ -318,21 +780,130 @@ def build(bld):
         output_command_line()
     if bld.env.LONG_COMMANDS == 'yes':
         long_command_line()
+    explain.enable(bld)
+
+
+def cpuopt(opt):
+    """Add an RTEMS cpuopt to the options loaded when configuring. Call before
+    configure. The option's value is set in the BSP's environment as 'Yes' or
+    'No'."""
+    if opt not in rtems_cpuopts:
+        rtems_cpuopts.append(opt)
 
 
 def load_cpuopts(conf):
-    options = [
-        'RTEMS_DEBUG', 'RTEMS_MULTIPROCESSING', 'RTEMS_NEWLIB',
-        'RTEMS_POSIX_API', 'RTEMS_SMP', 'RTEMS_NETWORKING'
+    """Load the cpuopts from the BSP's cpuopts.h header. Options the header
+    does not define or undefine are loaded from the macros defined by a single
+    preprocessor pass of rtems.h. If the preprocessor cannot be run each option
+    is checked by compiling a test application."""
+    macros, undefs = _cpuopts_header(conf.env.IFLAGS + conf.env.ISYSTEM)
+    preprocessed = False
+    missing = [
+        opt for opt in rtems_cpuopts
+        if _cpuopt_value(macros, opt) is None and opt not in undefs
     ]
-    for opt in options:
-        enabled = check_cpuopt(conf, opt)
+    if len(missing) != 0:
+        dm = _cpuopts_preprocess(conf)
+        if dm is not None:
+            macros = dm
+            undefs = set()
+            preprocessed = True
+    for opt in rtems_cpuopts:
+        enabled = _cpuopt_value(macros, opt)
+        if enabled is None and (opt in undefs or
+                                (preprocessed and opt not in macros)):
+            enabled = False
+        if enabled is None:
+            enabled = check_cpuopt(conf, opt)
+        elif enabled:
+            conf.msg('Checking for %s' % (opt), 'yes')
+        else:
+            conf.msg('Checking for %s' % (opt), False)
         if enabled:
             conf.env[opt] = 'Yes'
         else:
             conf.env[opt] = 'No'
 
 
+#
+# A define's value is on its line, `-dM` prints an empty define as
+# `#define NAME ` so the white space must not match a newline.
+#
+_re_define = re.compile(
+    r'^[ \t]*#[ \t]*define[ \t]+(\w+)(?:[ \t]+(.*?))?[ \t]*$', re.M)
+_re_undef = re.compile(
+    r'^[ \t]*/\*[ \t]*#[ \t]*undef[ \t]+(\w+)[ \t]*\*/[ \t]*$', re.M)
+
+
+def _cpuopts_macros(text):
+    '''Return the macros defined in the text. An empty define's value is an
+    empty string.
+
+    >>> sorted(_cpuopts_macros('#define RTEMS_NEWLIB \\n'
+    ...                        '#define RTEMS_POSIX_API 1\\n'
+    ...                        '#define RTEMS_SMP\\n'
+    ...                        '#define CPU_SIZEOF_POINTER 4\\n').items())
+    [('CPU_SIZEOF_POINTER', '4'), ('RTEMS_NEWLIB', ''), ('RTEMS_POSIX_API', '1'), ('RTEMS_SMP', '')]
+    '''
+    macros = {}
+    for m in _re_define.finditer(text):
+        macros[m.group(1)] = m.group(2) or ''
+    return macros
+
+
+def _cpuopts_header(incpaths):
+    for inc in incpaths:
+        header = os.path.join(inc, 'rtems', 'score', 'cpuopts.h')
+        if os.path.exists(header):
+            try:
+                with open(header, 'r') as h:
+                    text = h.read()
+            except (IOError, OSError):
+                break
+            return _cpuopts_macros(text), \
+                set([m.group(1) for m in _re_undef.finditer(text)])
+    return {}, set()
+
+
+def _cpuopts_preprocess(ctx):
+    """Return the macros rtems.h defines or None if the preprocessor fails."""
+    import waflib.Context
+    cflags = [f for f in ctx.env.CFLAGS if f not in ['-MD', '-MMD']]
+    cmd = ctx.env.CC + cflags + ['-dM', '-E', '-x', 'c', '-']
+    try:
+        out = ctx.cmd_and_log(cmd,
+                              input='#include <rtems.h>\n'.encode('utf-8'),
+                              output=waflib.Context.STDOUT,
+                              quiet=waflib.Context.BOTH)
+    except Exception as e:
+        ctx.to_log('cpuopts preprocessor failed: %s' % (e))
+        return None
+    return _cpuopts_macros(out)
+
+
+def _cpuopt_value(macros, opt):
+    """Evaluate an option as the preprocessor would in an #if. Return None
+    if the value cannot be evaluated."""
+    value = macros.get(opt)
+    seen = set()
+    while value is not None and opt not in seen:
+        seen.add(opt)
+        value = value.strip()
+        while value.startswith('(') and value.endswith(')'):
+            value = value[1:-1].strip()
+        if len(value) == 0:
+            return False
+        try:
+            return int(value.rstrip('uUlL'), 0) != 0
+        except ValueError:
+            pass
+        if re.match(r'^[A-Za-z_]\w*$', value) is None:
+            return None
+        opt = value
+        value = macros.get(opt)
+    return None
+
+
 def check(conf, *k, **kw):
     if 'fragment' not in kw:
         kw['fragment'] = test_application()
@@ -348,10 +919,8 @@ def check_cc(conf, *k, **kw):
 def check_lib_path(ctx, lib, libpath=[], mandatory=True):
     lib_lib = 'lib%s.a' % (lib)
     ctx.start_msg('Library %s' % (lib_lib))
-    cmd = '%s %s %s -print-file-name=%s' % (' '.join(ctx.env.CC), ' '.join(
-        ctx.env.CFLAGS), ' '.join(['-B' + l for l in libpath]), lib_lib)
-    out = ctx.cmd_and_log(cmd)
-    out = os.path.normpath(out.strip())
+    out = toolchain.print_file_name(
+        ctx, ctx.env.CC, ctx.env.CFLAGS + ['-B' + l for l in libpath], lib_lib)
     if out == lib_lib:
         if mandatory:
             ctx.fatal('The library %s not found' % (lib_lib))
@@ -383,23 +952,14 @@ def check_cpuopt(conf, opt):
     try:
         conf.check_cc(fragment=test_application(code),
                       execute=False,
-                      msg='Checking for %s' % (opt))
+                      msg='Checking for %s' % (opt),
+                      rtems_arch_bsp=conf.env.RTEMS_ARCH_BSP)
     except conf.errors.WafError:
         return False
     return True
 
 
 def tweaks(conf, arch_bsp):
-    #
-    # Hack to work around NIOS2 naming.
-    #
-    if conf.env.RTEMS_ARCH in ['nios2']:
-        conf.env.OBJCOPY_FLAGS = ['-O', 'elf32-littlenios2']
-    elif conf.env.RTEMS_ARCH in ['arm']:
-        conf.env.OBJCOPY_FLAGS = ['-I', 'binary', '-O', 'elf32-littlearm']
-    else:
-        conf.env.OBJCOPY_FLAGS = ['-O', 'elf32-' + conf.env.RTEMS_ARCH]
-
     #
     # Check for a i386 PC bsp.
     #
@@ -472,11 +1032,12 @@ def check_options(ctx, prefix, rtems_tools, rtems_path, rtems_version,
     # Match the archs requested against the ones found. If the user
     # wants all (default) set all used.
     #
+    cat = catalogue(rtems_path, rtems_version, rtems_config)
+    ctx.rtems_catalogue = cat
     if rtems_archs == 'all':
-        archs = _find_installed_archs(rtems_config, rtems_path, rtems_version)
+        archs = cat.all_archs()
     else:
-        archs = _check_archs(rtems_config, rtems_archs, rtems_path,
-                             rtems_version)
+        archs = _check_archs(cat, rtems_archs)
 
     #
     # Filter the architectures.
@@ -494,11 +1055,9 @@ def check_options(ctx, prefix, rtems_tools, rtems_path, rtems_version,
     # to those referenced by the BSPs.
     #
     if rtems_bsps == 'all':
-        arch_bsps = _find_installed_arch_bsps(rtems_config, rtems_path, archs,
-                                              rtems_version)
+        arch_bsps = cat.bsps(archs)
     else:
-        arch_bsps = _check_arch_bsps(rtems_bsps, rtems_config, rtems_path,
-                                     archs, rtems_version)
+        arch_bsps = _check_arch_bsps(cat, rtems_bsps, archs)
 
     if len(arch_bsps) == 0:
         ctx.fatal('No valid arch/bsps found')
@@ -631,25 +1190,46 @@ def arch_bsp_lib_path(version, arch_bsp):
 
 
 def library_path(library, cc, cflags):
-    cmd = cc + cflags + ['-print-file-name=%s' % library]
-    a = subprocess.check_output(cmd)
-    lib = os.path.abspath(a.strip())
+    lib = os.path.abspath(toolchain.print_file_name(None, cc, cflags, library))
     if os.path.exists(lib):
         return os.path.dirname(lib)
     return None
 
 
-def root_filesystem(bld, name, files, tar, obj):
-    tar_rule = 'tar -cf ${TGT} --format=ustar -C ../.. $(echo "${SRC}" | sed -e \'s/\\.\\.\\/\\.\\.\\///g\')'
-    if windows:
-        tar_rule = 'sh -c "%s"' % (tar_rule)
-    bld(name=name + '_tar', target=tar, source=files, rule=tar_rule)
-    bld.objects(
-        name=name,
-        target=obj,
-        source=tar,
-        rule=
-        '${OBJCOPY} -I binary -B ${RTEMS_ARCH} ${OBJCOPY_FLAGS} ${SRC} ${TGT}')
+def root_filesystem(bld,
+                    name,
+                    files,
+                    tar,
+                    obj,
+                    compress=None,
+                    level=None,
+                    jobs=None):
+    #
+    # The files are added to the tar file with their paths relative to the
+    # top of the source tree. The tar file is updated in place when a file
+    # changes. The tar file is embedded in the object with the symbols
+    # `objcopy -I binary` defines. If compress is `gzip` or `xz` the tar
+    # file is compressed and the compressed file is embedded. The gzip
+    # compression uses jobs threads.
+    #
+    tar = bld.path.find_or_declare(tar)
+    rootfs.tar_file(bld,
+                    name=name + '_tar',
+                    target=tar,
+                    source=files,
+                    format='ustar')
+    image = tar
+    if compress is not None:
+        image = tar.parent.find_or_declare(
+            tar.name + rootfs.compressions.get(compress, ''))
+        rootfs.compress_file(bld,
+                             name=name + '_' + compress,
+                             target=image,
+                             source=tar,
+                             method=compress,
+                             level=level,
+                             jobs=jobs)
+    rootfs.embed(bld, name=name, source=image, obj=obj)
 
 
 def clone_tasks(bld):
@@ -740,7 +1320,8 @@ def long_command_line():
                 # Line may be very long:
                 # Logs.debug('runner:' + ' '.join(flat))
                 cmd = [cmd[0], '@' + tmp]
-            ret = super(self.__class__, self).exec_command(cmd, **kw)
+            ret = super(self.derived_long_command,
+                        self).exec_command(cmd, **kw)
         finally:
             if tmp:
                 os.remove(tmp)
@@ -749,114 +1330,141 @@ def long_command_line():
     for k in 'c cxx cprogram cxxprogram cshlib cxxshlib cstlib cxxstlib'.split(
     ):
         cls = Task.classes.get(k)
-        if cls:
+        #
+        # The class is named in super() so a class derived from the wrapper,
+        # for example to explain the build, does not call the wrapper again.
+        #
+        if cls and getattr(cls, 'derived_long_command', None) is not cls:
             derived_class = type(k, (cls, ), {})
+            derived_class.derived_long_command = derived_class
             derived_class.exec_command = exec_command
             if hasattr(cls, 'hcode'):
                 derived_class.hcode = cls.hcode
 
 
-def _find_tools(conf, arch, paths, tools):
+def _find_tools(conf, arch, tool_index, tools):
     if arch not in tools:
         arch_tools = {}
-        arch_tools['CC'] = conf.find_program([arch + '-gcc'], path_list=paths)
-        arch_tools['CXX'] = conf.find_program([arch + '-g++'], path_list=paths)
+
+        def find(name, mandatory=True):
+            return tool_index.find_program(conf, name, mandatory=mandatory)
+
+        arch_tools['CC'] = find(arch + '-gcc')
+        arch_tools['CXX'] = find(arch + '-g++')
         arch_tools['LINK_CC'] = arch_tools['CC']
         arch_tools['LINK_CXX'] = arch_tools['CXX']
-        arch_tools['AS'] = conf.find_program([arch + '-gcc'], path_list=paths)
-        arch_tools['LD'] = conf.find_program([arch + '-ld'], path_list=paths)
-        arch_tools['AR'] = conf.find_program([arch + '-ar'], path_list=paths)
-        arch_tools['NM'] = conf.find_program([arch + '-nm'], path_list=paths)
-        arch_tools['OBJDUMP'] = conf.find_program([arch + '-objdump'],
-                                                  path_list=paths)
-        arch_tools['OBJCOPY'] = conf.find_program([arch + '-objcopy'],
-                                                  path_list=paths)
-        arch_tools['READELF'] = conf.find_program([arch + '-readelf'],
-                                                  path_list=paths)
-        arch_tools['STRIP'] = conf.find_program([arch + '-strip'],
-                                                path_list=paths)
-        arch_tools['RANLIB'] = conf.find_program([arch + '-ranlib'],
-                                                 path_list=paths)
-        arch_tools['RTEMS_LD'] = conf.find_program(['rtems-ld'],
-                                                   path_list=paths,
-                                                   mandatory=False)
-        arch_tools['RTEMS_TLD'] = conf.find_program(['rtems-tld'],
-                                                    path_list=paths,
-                                                    mandatory=False)
-        arch_tools['RTEMS_SYMS'] = conf.find_program(['rtems-syms'],
-                                                     path_list=paths,
-                                                     mandatory=False)
-        arch_tools['RTEMS_BIN2C'] = conf.find_program(['rtems-bin2c'],
-                                                      path_list=paths,
-                                                      mandatory=False)
-        arch_tools['TAR'] = conf.find_program(['tar'], mandatory=False)
+        arch_tools['AS'] = find(arch + '-gcc')
+        arch_tools['LD'] = find(arch + '-ld')
+        arch_tools['AR'] = find(arch + '-ar')
+        arch_tools['NM'] = find(arch + '-nm')
+        arch_tools['OBJDUMP'] = find(arch + '-objdump')
+        arch_tools['OBJCOPY'] = find(arch + '-objcopy')
+        arch_tools['READELF'] = find(arch + '-readelf')
+        arch_tools['STRIP'] = find(arch + '-strip')
+        arch_tools['RANLIB'] = find(arch + '-ranlib')
+        arch_tools['RTEMS_LD'] = find('rtems-ld', mandatory=False)
+        arch_tools['RTEMS_TLD'] = find('rtems-tld', mandatory=False)
+        arch_tools['RTEMS_SYMS'] = find('rtems-syms', mandatory=False)
+        arch_tools['RTEMS_BIN2C'] = find('rtems-bin2c', mandatory=False)
+        #
+        # The host's tar is not an RTEMS tool and is found once.
+        #
+        if len(tools) == 0:
+            arch_tools['TAR'] = conf.find_program(['tar'], mandatory=False)
+        else:
+            arch_tools['TAR'] = tools[list(tools.keys())[0]]['TAR']
         tools[arch] = arch_tools
     return tools
 
 
-def _find_installed_archs(config, path, version):
-    archs = []
-    if config is None:
-        for d in os.listdir(path):
-            if d.endswith('-rtems' + version):
-                archs += [d]
-    else:
-        a = subprocess.check_output([config, '--list-format', '"%(arch)s"'])
-        a = a[:-1].replace('"', '')
-        archs = set(a.split())
-        archs = ['%s-rtems%s' % (x, version) for x in archs]
-    archs.sort()
-    return archs
+class catalogue(object):
+    '''The catalogue of the archs and BSPs installed in an RTEMS path.
+
+    The pkgconfig directory is listed, or `rtems-config` is run, once and the
+    archs and BSPs are indexed. A BSP's package is loaded when first asked
+    for.
+    '''
+    def __init__(self, path, version, config=None):
+        self.path = path
+        self.version = version
+        self.config = config
+        self.archs = []
+        self.arch_bsps = {}
+        self.installed = set()
+        self.packages = {}
+        self.scan()
+
+    def scan(self):
+        arch_bsps = []
+        if self.config is None:
+            for d in os.listdir(self.path):
+                if d.endswith('-rtems' + self.version):
+                    self.archs += [d]
+            for f in os.listdir(_pkgconfig_path(self.path)):
+                if f.endswith('.pc'):
+                    arch_bsps += [f[:-3]]
+        else:
+            ab = subprocess.check_output([self.config, '--list-format'])
+            if not isinstance(ab, str):
+                ab = ab.decode('utf-8', 'replace')
+            ab = ab.replace('"', '')
+            ab = ab.replace('/', '-rtems%s-' % (self.version))
+            arch_bsps = ab.split()
+            self.archs = [_arch_from_arch_bsp(x) for x in arch_bsps]
+        self.archs = sorted(set(self.archs))
+        for ab in sorted(set(arch_bsps)):
+            arch = _arch_from_arch_bsp(ab)
+            if arch in self.archs:
+                self.arch_bsps.setdefault(arch, []).append(ab)
+                self.installed.add(ab)
+
+    def all_archs(self):
+        return list(self.archs)
+
+    def bsps(self, archs):
+        '''Return the installed BSPs of the archs.'''
+        arch_bsps = []
+        for arch in archs:
+            arch_bsps += self.arch_bsps.get(arch, [])
+        return sorted(arch_bsps)
+
+    def is_installed(self, arch_bsp):
+        return arch_bsp in self.installed
 
+    def package(self, arch_bsp):
+        '''Return the BSP's pkgconfig package or None if the BSP has no
+        package.'''
+        if self.config is not None or arch_bsp not in self.installed:
+            return None
+        if arch_bsp not in self.packages:
+            pc = os.path.join(_pkgconfig_path(self.path), arch_bsp + '.pc')
+            self.packages[arch_bsp] = pkgconfig.package(pc)
+        return self.packages[arch_bsp]
 
-def _check_archs(config, req, path, version):
-    installed = _find_installed_archs(config, path, version)
+
+def _check_archs(cat, req):
     archs = []
     for a in req.split(','):
-        arch = a + '-rtems' + version
-        if arch in installed:
+        arch = a + '-rtems' + cat.version
+        if arch in cat.archs:
             archs += [arch]
     archs.sort()
     return archs
 
 
-def _find_installed_arch_bsps(config, path, archs, version):
-    arch_bsps = []
-    if config is None:
-        for f in os.listdir(_pkgconfig_path(path)):
-            if f.endswith('.pc'):
-                if _arch_from_arch_bsp(f[:-3]) in archs:
-                    arch_bsps += [f[:-3]]
-    else:
-        ab = subprocess.check_output([config, '--list-format'])
-        ab = ab[:-1].replace('"', '')
-        ab = ab.replace('/', '-rtems%s-' % (version))
-        arch_bsps = [x for x in set(ab.split())]
-    arch_bsps.sort()
-    return arch_bsps
-
-
-def _check_arch_bsps(req, config, path, archs, version):
+def _check_arch_bsps(cat, req, archs):
     archs_bsps = []
     for ab in req.split(','):
         abl = ab.split('/')
         if len(abl) != 2:
             return []
-        found = False
-        for arch in archs:
-            a = '%s-rtems%s' % (abl[0], version)
-            if a == arch:
-                found = True
-                break
-        if not found:
+        a = '%s-rtems%s' % (abl[0], cat.version)
+        if a not in archs:
             return []
         archs_bsps += ['%s-%s' % (a, abl[1])]
-    if len(archs_bsps) == 0:
-        return []
-    installed = _find_installed_arch_bsps(config, path, archs, version)
     bsps = []
     for b in archs_bsps:
-        if b in installed:
+        if cat.is_installed(b):
             bsps += [b]
     bsps.sort()
     return bsps
@@ -882,16 +1490,25 @@ def _pkgconfig_path(path):
     return os.path.join(path, 'lib', 'pkgconfig')
 
 
-def _load_flags(conf, arch_bsp, path):
+def _load_flags(conf, arch_bsp, path, cache=None):
     if not os.path.exists(path):
-        ctx.fatal('RTEMS path not found.')
+        conf.fatal('RTEMS path not found.')
     if os.path.exists(_pkgconfig_path(path)):
         pc = os.path.join(_pkgconfig_path(path), arch_bsp + '.pc')
         conf.to_log('Opening and load pkgconfig: ' + pc)
-        pkg = pkgconfig.package(pc)
+        #
+        # The package is loaded by the catalogue check_options created.
+        #
+        pkg = None
+        cat = getattr(conf, 'rtems_catalogue', None)
+        if cat is not None and cat.path == path:
+            pkg = cat.package(arch_bsp)
+        if pkg is None:
+            pkg = pkgconfig.package(pc)
         config = None
     elif os.path.exists(os.path.join(path, 'rtems-config')):
-        config = os.path.join(path, 'rtems-config')
+        config = _rtems_config_flags(conf, os.path.join(path, 'rtems-config'),
+                                     arch_bsp, cache)
         pkg = None
     flags = {}
     _log_header(conf)
@@ -906,6 +1523,27 @@ def _load_flags(conf, arch_bsp, path):
     return flags
 
 
+def _rtems_config_flags(conf, config, arch_bsp, cache=None):
+    '''Return the BSP's flags `rtems-config` reports. The output is held in
+    the configure cache keyed on the `rtems-config` script so it is only run
+    again if the script changes. The libraries are fixed and not queried.'''
+    key = arch_bsp_name(arch_bsp)
+    fp = confcache.fingerprint(confcache.file_stamp(config))
+    flags = None
+    if cache is not None:
+        flags = cache.get('rtems-config', key, fp)
+    if flags is None:
+        flags = {}
+        for f, opt in [('CFLAGS', '--cflags'), ('LDFLAGS', '--ldflags')]:
+            out = subprocess.check_output([config, '--bsp', key, opt])
+            if not isinstance(out, str):
+                out = out.decode('utf-8', 'replace')
+            flags[f] = out.strip()
+        if cache is not None:
+            cache.set('rtems-config', key, fp, flags)
+    return flags
+
+
 def _load_flags_set(flags, arch_bsp, conf, config, pkg):
     conf.to_log('%s ->' % flags)
     if pkg is not None:
@@ -916,27 +1554,13 @@ def _load_flags_set(flags, arch_bsp, conf, config, pkg):
             conf.to_log('pkconfig warning: ' + e.msg)
         conf.to_log('  ' + flagstr)
     else:
-        flags_map = {
-            'CFLAGS': '--cflags',
-            'LDFLAGS': '--ldflags',
-            'LIB': '--libs'
-        }
-        ab = arch_bsp.split('-')
-        #conf.check_cfg(path = config,
-        #               package = '',
-        #               uselib_store = 'rtems',
-        #               args = '--bsp %s/%s %s' % (ab[0], ab[2], flags_map[flags]))
-        #print conf.env
-        #print '%r' % conf
-        #flagstr = '-l -c'
-        flagstr = subprocess.check_output(
-            [config, '--bsp',
-             '%s/%s' % (ab[0], ab[2]), flags_map[flags]])
-        #print flags, ">>>>", flagstr
-        if flags == 'CFLAGS':
-            flagstr += ' -DWAF_BUILD=1'
         if flags == 'LIB':
             flagstr = 'rtemscpu rtemsbsp c rtemscpu rtemsbsp'
+        else:
+            flagstr = config[flags]
+        if flags == 'CFLAGS':
+            flagstr += ' -DWAF_BUILD=1'
+        conf.to_log('  ' + flagstr)
     return flagstr.split()
 
 
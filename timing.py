@@ -0,0 +1,132 @@
+#
+# RTEMS Project (https://www.rtems.org/)
+#
+# Copyright (c) 2026 RTEMS Project Contributors. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions
+#  are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+#
+# Configure phase timing.
+#
+# A timer records the wall time of the configure phases for each BSP. The
+# phases can be timed from more than one thread. The report is written as
+# JSON to the build directory and a summary of the phases sorted by time is
+# written to the configure log.
+#
+
+import contextlib
+import json
+import threading
+import time
+
+report_file = 'rtems-configure-timing.json'
+report_version = 1
+
+try:
+    _clock = time.perf_counter
+except AttributeError:
+    _clock = time.time
+
+
+class timer(object):
+    '''Record the wall time of phases.'''
+    def __init__(self):
+        self.start = _clock()
+        self.end = None
+        self.times = []
+        self.lock = threading.Lock()
+
+    def add(self, phase, bsp, secs):
+        with self.lock:
+            self.times += [(phase, bsp, secs)]
+
+    @contextlib.contextmanager
+    def phase(self, phase, bsp=None):
+        start = _clock()
+        try:
+            yield
+        finally:
+            self.add(phase, bsp, _clock() - start)
+
+    def stop(self):
+        if self.end is None:
+            self.end = _clock()
+
+    def report(self):
+        '''Return the report as a dictionary.'''
+        self.stop()
+        phases = {}
+        bsps = {}
+        with self.lock:
+            times = list(self.times)
+        for phase, bsp, secs in times:
+            if phase not in phases:
+                phases[phase] = {'total': 0.0, 'count': 0}
+            phases[phase]['total'] += secs
+            phases[phase]['count'] += 1
+            if bsp is not None:
+                bsps.setdefault(bsp, {})
+                bsps[bsp][phase] = bsps[bsp].get(phase, 0.0) + secs
+        return {
+            'version': report_version,
+            'total': self.end - self.start,
+            'phases': phases,
+            'bsps': bsps
+        }
+
+    def summary(self, report=None):
+        '''Return the summary lines of the phases sorted by time.'''
+        if report is None:
+            report = self.report()
+        phases = sorted(report['phases'].items(),
+                        key=lambda p: p[1]['total'],
+                        reverse=True)
+        lines = ['Configure timing: %.3f secs' % (report['total'])]
+        for phase, t in phases:
+            lines += [
+                ' %-32s %9.3f secs %5d call(s)' %
+                (phase, t['total'], t['count'])
+            ]
+        return lines
+
+    def write(self, path):
+        report = self.report()
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        return report
+
+
+@contextlib.contextmanager
+def _untimed():
+    yield
+
+
+def phase(ctx, name):
+    '''Time a phase of the BSP in the context's environment if the context has
+    a timer.'''
+    t = getattr(ctx, 'rtems_timer', None)
+    if t is None:
+        return _untimed()
+    bsp = ctx.env.RTEMS_ARCH_BSP
+    if not bsp:
+        bsp = None
+    return t.phase(name, bsp)
@@ -0,0 +1,191 @@
+#
+# RTEMS Project (https://www.rtems.org/)
+#
+# Copyright (c) 2026 RTEMS Project Contributors. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions
+#  are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+#
+# RTEMS tool chain support.
+#
+
+import os
+import re
+import subprocess
+import sys
+import threading
+
+from . import confcache
+
+windows = os.name == 'nt' or sys.platform in ['msys', 'cygwin']
+
+
+def _is_tool(name):
+    return name.startswith('rtems-') or '-rtems' in name
+
+
+def _scan_dir(path):
+    '''Return the RTEMS tools in a directory as a list of names and paths.'''
+    tools = []
+    try:
+        scandir = os.scandir
+    except AttributeError:
+        scandir = None
+    try:
+        if scandir is not None:
+            for entry in scandir(path):
+                if _is_tool(entry.name) and entry.is_file():
+                    tools += [(entry.name, entry.path)]
+        else:
+            for name in os.listdir(path):
+                exe = os.path.join(path, name)
+                if _is_tool(name) and os.path.isfile(exe):
+                    tools += [(name, exe)]
+    except OSError:
+        pass
+    return tools
+
+
+class index(object):
+    '''An index of the RTEMS tools in the tools' bin directories.
+
+    Each directory is scanned once and all the architecture tools, for example
+    `sparc-rtems6-gcc`, and the RTEMS tools, for example `rtems-ld`, are
+    indexed by name. The directories are searched in order and the first
+    directory a tool is found in is used. The index is held in the configure
+    cache and a directory is only scanned again if its modified time changes.
+    '''
+    def __init__(self, paths, cache=None):
+        self.paths = paths
+        self.tools = None
+        fp = confcache.fingerprint(
+            [confcache.file_stamp(path) for path in paths])
+        if cache is not None:
+            self.tools = cache.get('tools', ','.join(paths), fp)
+        if self.tools is None:
+            self.tools = self.scan()
+            if cache is not None:
+                cache.set('tools', ','.join(paths), fp, self.tools)
+
+    def scan(self):
+        tools = {}
+        for path in self.paths:
+            for name, exe in _scan_dir(path):
+                if windows and name.lower().endswith('.exe'):
+                    name = name[:-4]
+                if name not in tools:
+                    tools[name] = exe
+        return tools
+
+    def find(self, name):
+        '''Return the path to the tool or None if not found.'''
+        return self.tools.get(name)
+
+    def find_program(self, conf, name, mandatory=True):
+        '''Find a program in the index reporting and setting the environment
+        the same way the configure context's find_program does.'''
+        exe = self.find(name)
+        if exe is None:
+            conf.msg('Checking for program %r' % (name), False)
+            conf.to_log('find program=%r paths=%r -> not found' %
+                        (name, self.paths))
+            if mandatory:
+                conf.fatal('Could not find the program %r' % (name))
+            return None
+        conf.msg('Checking for program %r' % (name), exe)
+        conf.to_log('find program=%r paths=%r -> %r' % (name, self.paths, exe))
+        conf.env[re.sub(r'[-.]', '_', name.upper())] = [exe]
+        return [exe]
+
+
+class compiler(object):
+    '''The identity of a compiler.
+
+    The identity is the version. A compiler is probed once per configure and
+    the identity is held in the configure cache keyed on the compiler's path,
+    modified time and size.
+    '''
+    def __init__(self, path, identity):
+        self.path = path
+        self.identity = identity
+        self.version = identity['version']
+
+
+_compilers = {}
+_compilers_lock = threading.Lock()
+
+_file_names = {}
+
+
+def _run(ctx, cmd):
+    if ctx is None:
+        out = subprocess.check_output(cmd)
+        if not isinstance(out, str):
+            out = out.decode('utf-8', 'replace')
+        return out
+    import waflib.Context
+    return ctx.cmd_and_log(cmd,
+                           output=waflib.Context.STDOUT,
+                           quiet=waflib.Context.BOTH)
+
+
+def _probe(ctx, cc):
+    vline = _run(ctx, [cc, '--version']).split('\n')[0]
+    return {'version': ' '.join(vline.split()[2:])}
+
+
+def identify(ctx, cc, cache=None):
+    '''Return the compiler's identity probing the compiler if it is not known.
+    The context is used to run the compiler and can be None.'''
+    stamp = confcache.file_stamp(cc)
+    with _compilers_lock:
+        if stamp in _compilers:
+            return _compilers[stamp]
+    identity = None
+    fp = confcache.fingerprint(stamp)
+    if cache is not None:
+        identity = cache.get('compilers', cc, fp)
+    if identity is None:
+        identity = _probe(ctx, cc)
+        if cache is not None:
+            cache.set('compilers', cc, fp, identity)
+    with _compilers_lock:
+        if stamp not in _compilers:
+            _compilers[stamp] = compiler(cc, identity)
+        return _compilers[stamp]
+
+
+def print_file_name(ctx, cc, flags, name):
+    '''Return the compiler's path for a file name, for example a library. The
+    path depends on the multilib the flags select so the result is held for
+    the compiler, keyed on its path, modified time and size, and the flags
+    used. The compiler's output is returned and is the name if the file is
+    not found.'''
+    key = (confcache.file_stamp(cc[0]), tuple(cc[1:] + flags), name)
+    with _compilers_lock:
+        if key in _file_names:
+            return _file_names[key]
+    out = _run(ctx, cc + flags + ['-print-file-name=%s' % (name)])
+    out = os.path.normpath(out.strip())
+    with _compilers_lock:
+        _file_names[key] = out
+    return out